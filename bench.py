@@ -0,0 +1,278 @@
+import argparse
+import json
+import platform
+import random
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from chunked import ChunkedBoard
+from engine import Game, play_game
+from main import BOMB, COUNT_MASK, Board
+from probability import probability_policy
+from savefile import load_board, save_board
+
+# Benchmarks for the board's hot paths: building a board, counting surrounding bombs, flood-fill digging, printing the
+# board, playing whole games headlessly, and digging & printing on a huge chunked board. Every benchmark runs on fixed
+# seeds so results can be compared from one run to the next. Results are written as JSON, and --compare checks them
+# against a stored baseline and exits with status 1 if anything got slower by more than --threshold.
+#
+#   python bench.py --out baseline.json
+#   python bench.py --compare baseline.json
+
+DEFAULT_SIZES = [9, 30, 100, 1000]
+DEFAULT_DENSITIES = [0.10, 0.20]
+# Whole games on a 1000x1000 board take far longer than everything else put together, so by default games are only
+# benchmarked up to this size (use --max-game-size to change it)
+DEFAULT_MAX_GAME_SIZE = 100
+# Chunked boards are for boards far too big to build whole, so they're benchmarked at their own sizes
+DEFAULT_CHUNKED_SIZES = [100_000]
+# (rows, columns) of spots printed by the render_viewport benchmark, about what fits in a full-screen terminal
+VIEWPORT_SIZE = (50, 50)
+FIXTURE_DIR = None
+
+
+def make_board(dim, density, seed):
+    board = Board()
+    board.dim_size = dim
+    board.num_bombs = max(1, min(dim ** 2 - 1, round(dim ** 2 * density)))
+    board.make_new_board(seed)
+    return board
+
+
+# --- Benchmarks
+# Each benchmark takes (dim, density, seed) and returns (run, work, unit, extra): `run` is the function to time and
+# `work` is how many `unit`s one call to it gets through, which is used to work out the throughput. Anything that
+# isn't part of what's being measured happens before `run` is returned.
+
+def bench_make_new_board(dim, density, seed):
+    board = make_board(dim, density, seed)
+    return (lambda: board.make_new_board(seed)), dim ** 2, 'spots', {'bombs': board.num_bombs}
+
+
+def bench_assign_values(dim, density, seed):
+    board = make_board(dim, density, seed)
+    return board.assign_values_to_board, dim ** 2, 'spots', {'bombs': board.num_bombs}
+
+
+# Times digging the biggest empty region on the board
+def bench_flood_fill(dim, density, seed):
+    board = make_board(dim, density, seed)
+    start, size = None, 0
+    for i, cell in enumerate(board.cells):
+        if not cell & (BOMB | COUNT_MASK) and i not in board.dug:  # not dug, not a bomb, and no surrounding bombs
+            region = board.dig_region(*divmod(i, dim))
+            if len(region) > size:
+                start, size = divmod(i, dim), len(region)
+    board.clear_dug()
+    if start is None:  # No empty spots at all, so just dig a single number
+        start = next(divmod(i, dim) for i, cell in enumerate(board.cells) if not cell & BOMB)
+        size = 1
+
+    def run():
+        board.clear_dug()
+        board.dig_region(*start)
+
+    return run, size, 'spots', {'region_size': size}
+
+
+# Times loading a saved board (with about half of it dug) back into memory
+def bench_load_board(dim, density, seed):
+    board = half_dug_board(dim, density, seed)
+    path = os.path.join(fixture_dir(), f'{dim}-{density}-{seed}.save')
+    save_board(board, path)
+    return (lambda: load_board(path)), dim ** 2, 'spots', {'file_kib': round(os.path.getsize(path) / 1024, 1)}
+
+
+# Save files made by the benchmarks go in a temporary directory that's deleted when the benchmarks finish
+def fixture_dir():
+    global FIXTURE_DIR
+    if FIXTURE_DIR is None:
+        FIXTURE_DIR = tempfile.TemporaryDirectory(prefix='minesweeper-bench-')
+    return FIXTURE_DIR.name
+
+
+# Times printing the whole board from scratch, with about half of it dug
+def bench_render_full(dim, density, seed):
+    board = half_dug_board(dim, density, seed)
+
+    def run():
+        board.clear_render_cache()
+        board.render_board()
+
+    return run, dim ** 2, 'spots', {}
+
+
+# Times printing a screenful (VIEWPORT_SIZE) of the board around its middle, with about half of it dug
+def bench_render_viewport(dim, density, seed):
+    board = half_dug_board(dim, density, seed)
+    height, width = min(dim, VIEWPORT_SIZE[0]), min(dim, VIEWPORT_SIZE[1])
+    top, left = (dim - height) // 2, (dim - width) // 2
+    return (lambda: board.render_viewport(top, left, height, width)), height * width, 'spots', {}
+
+
+def half_dug_board(dim, density, seed):
+    board = make_board(dim, density, seed)
+    for i, cell in enumerate(board.cells):
+        if i % 2 == 0 and not cell & BOMB:
+            board.dig_region(*divmod(i, dim))
+    return board
+
+
+# Times printing the board again after flagging a single spot
+def bench_render_incremental(dim, density, seed):
+    board = make_board(dim, density, seed)
+    board.render_board()
+    spots = iter(range(dim ** 2))
+
+    def run():
+        board.flag_spot(*divmod(next(spots, 0), dim))
+        board.render_board()
+
+    return run, 1, 'renders', {}
+
+
+# Times playing one whole game with the solver (guessing the safest spot when it has to). The game is the same every
+# time since both the board and the solver's guesses come from the seed.
+def bench_game(dim, density, seed):
+    num_bombs = max(1, min(dim ** 2 - 10, round(dim ** 2 * density)))
+    results = []
+
+    def run():
+        game = Game(dim, num_bombs, seed)
+        results.append(play_game(game, probability_policy, random.Random(seed)))
+
+    return run, 1, 'games', {'bombs': num_bombs, 'results': results}
+
+
+# Times starting a game on a chunked board (see chunked.py): making the board, the first dig and printing a screenful
+# (VIEWPORT_SIZE) around it. Only the tiles those touch get built, so this should take about the same time on any size
+# of board.
+def bench_chunked(dim, density, seed):
+    board = ChunkedBoard(dim, density)
+    middle = (dim // 2, dim // 2)
+    height, width = min(dim, VIEWPORT_SIZE[0]), min(dim, VIEWPORT_SIZE[1])
+    top, left = max(0, middle[0] - height // 2), max(0, middle[1] - width // 2)
+
+    def run():
+        board.make_new_board(seed, safe_spot=middle)
+        board.dig_spot(*middle)
+        board.render_viewport(top, left, height, width)
+
+    run()
+    return run, 1, 'games', {'region_size': board.num_dug, 'tiles': len(board.tiles)}
+
+
+BENCHMARKS = {
+    'make_new_board': bench_make_new_board,
+    'assign_values_to_board': bench_assign_values,
+    'flood_fill': bench_flood_fill,
+    'render_full': bench_render_full,
+    'render_incremental': bench_render_incremental,
+    'render_viewport': bench_render_viewport,
+    'load_board': bench_load_board,
+    'game': bench_game,
+    'chunked': bench_chunked,
+}
+
+
+# Runs one benchmark: `repeats` timed calls, then one more call under tracemalloc for the peak memory (tracemalloc
+# slows everything down, so it's kept out of the timed calls)
+def run_benchmark(name, dim, density, seed, repeats):
+    run, work, unit, extra = BENCHMARKS[name](dim, density, seed)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    if 'results' in extra:
+        result = extra.pop('results')[-1]
+        extra = dict(extra, state=result['state'], moves=result['moves'])
+    best = min(times)
+    return {'benchmark': name, 'dim': dim, 'density': density, 'seed': seed, 'repeats': repeats,
+            'best_s': best, 'median_s': statistics.median(times),
+            'throughput': work / best if best else None, 'unit': f'{unit}/s',
+            'peak_kib': round(peak / 1024, 1), **extra}
+
+
+def run_all(names, sizes, densities, seed, repeats, max_game_size, chunked_sizes=DEFAULT_CHUNKED_SIZES,
+            log=sys.stderr):
+    results = []
+    for name in names:
+        for dim in chunked_sizes if name == 'chunked' else sizes:
+            if name == 'game' and dim > max_game_size:
+                continue
+            for density in densities:
+                result = run_benchmark(name, dim, density, seed, repeats)
+                results.append(result)
+                print(f"{name:>24} {dim:>5}x{dim:<5} {density:>5.0%}  best {result['best_s'] * 1000:10.2f} ms  "
+                      f"{result['throughput']:14,.0f} {result['unit']:<11} peak {result['peak_kib']:10,.1f} KiB",
+                      file=log)
+    return results
+
+
+# Compares results to a baseline and returns the ones that got slower by more than `threshold` (e.g. 0.25 = 25%).
+# Benchmarks that only take a fraction of a millisecond are noisy, so a slowdown also has to be at least min_delta
+# seconds to count.
+def find_regressions(results, baseline, threshold, min_delta=0.0):
+    baseline_times = {(r['benchmark'], r['dim'], r['density']): r['best_s'] for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = baseline_times.get((result['benchmark'], result['dim'], result['density']))
+        if before and result['best_s'] > before * (1 + threshold) and result['best_s'] - before >= min_delta:
+            regressions.append(dict(result, baseline_s=before, slowdown=result['best_s'] / before))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark board generation, digging, printing and solving.")
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES)
+    parser.add_argument('--densities', nargs='+', type=float, default=DEFAULT_DENSITIES)
+    parser.add_argument('--max-game-size', type=int, default=DEFAULT_MAX_GAME_SIZE)
+    parser.add_argument('--chunked-sizes', nargs='+', type=int, default=DEFAULT_CHUNKED_SIZES)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--out', help="file to write the JSON results to (default: stdout)")
+    parser.add_argument('--compare', help="baseline JSON file to check the results against")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="how much slower than the baseline counts as a regression (default: 0.25 = 25%%)")
+    parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                        help="ignore slowdowns smaller than this many milliseconds (default: 0.5)")
+    args = parser.parse_args(argv)
+
+    results = run_all(args.only, args.sizes, args.densities, args.seed, args.repeats, args.max_game_size,
+                      args.chunked_sizes)
+    report = {'python': platform.python_version(), 'platform': platform.platform(), 'results': results}
+    if args.out:
+        with open(args.out, 'w') as out:
+            json.dump(report, out, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = find_regressions(results, json.load(baseline_file), args.threshold,
+                                           args.min_delta_ms / 1000)
+        for r in regressions:
+            print(f"REGRESSION: {r['benchmark']} {r['dim']}x{r['dim']} {r['density']:.0%}: "
+                  f"{r['baseline_s'] * 1000:.2f} ms -> {r['best_s'] * 1000:.2f} ms ({r['slowdown']:.2f}x)",
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions.", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,386 @@
+import math
+import random
+from collections import OrderedDict
+from operator import add, or_, sub
+
+from main import BOMB, COUNT_MASK, DUG, FLAGGED, REVEAL_TABLE, Board
+
+# A board that's split into square tiles which are only built when something needs them, so the play area can be far
+# bigger than what would fit in memory (100k x 100k, or no edges at all with dim_size=None).
+#
+# Each tile's bombs are picked from a random.Random seeded with (seed, tile row, tile col), so a tile always gets the
+# same bombs no matter when or how many times it's built. Surrounding-bomb counts along a tile's edges need the bombs in
+# the tiles next to it too, but those are cheap to regenerate, so they're kept in a separate cache of bomb masks.
+# Only the most recently used tiles are kept in full (one byte per spot, same layout as Board.cells). When a tile
+# falls out of that cache, only its dug & flagged spots are kept, packed down to a bit per spot, and everything else
+# is rebuilt from the seed the next time the tile is needed. Tiles nobody has touched are never built at all.
+
+TILE_SIZE = 64
+# The most spots one dig can open. A dig that would open more stops there, and digging the same spot again (or any dug
+# spot with no surrounding bombs) carries on from there (see dig_region()).
+MAX_REVEAL = 100_000
+# Below about 9% bombs, the spots with no surrounding bombs join up into one region that goes on forever, so on an
+# endless board one dig could keep going without end. Endless boards need at least this many bombs.
+MIN_ENDLESS_DENSITY = 0.10
+
+# Translation tables for packing dug/flagged bits into '0'/'1' strings (which int(..., 2) turns into one big int) and
+# back, and for turning a 0/1 bomb mask into BOMB bits
+DUG_TO_BIT = bytes(ord('1') if b & DUG else ord('0') for b in range(256))
+FLAGGED_TO_BIT = bytes(ord('1') if b & FLAGGED else ord('0') for b in range(256))
+BIT_TO_DUG = bytes(DUG if b == ord('1') else 0 for b in range(256))
+BIT_TO_FLAGGED = bytes(FLAGGED if b == ord('1') else 0 for b in range(256))
+CLEAR_DUG_TABLE = bytes(b & ~DUG for b in range(256))
+MASK_TO_BOMB = bytes(BOMB if b else 0 for b in range(256))
+
+
+class ChunkedBoard(Board):
+    def __init__(self, dim_size=100_000, bomb_density=0.15, tile_size=TILE_SIZE, max_tiles=1024, max_reveal=MAX_REVEAL):
+        if dim_size is None and bomb_density < MIN_ENDLESS_DENSITY:
+            raise ValueError(f"Endless boards need a bomb density of at least {MIN_ENDLESS_DENSITY}, or a single dig "
+                             f"could open up spots forever.")
+        if max_tiles < 1:
+            raise ValueError("max_tiles has to be at least 1.")
+        super().__init__()
+        # dim_size=None means the board goes on forever in every direction
+        self.dim_size = dim_size
+        self.bomb_density = bomb_density
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.max_reveal = max_reveal
+        # (row, col) of a dig that stopped at max_reveal -> the spots it still has to dig around, oldest dig first
+        self.unfinished_digs = OrderedDict()
+
+        self.tiles = OrderedDict()  # (tile row, tile col) -> bytearray of the tile's spots, least recently used first
+        self.cold_tiles = {}  # (tile row, tile col) -> (dug bits, flagged bits) for tiles that have been evicted
+        self.bomb_masks = OrderedDict()  # (tile row, tile col) -> bytes with a 1 for each bomb in the tile
+
+        # The board's counters work the same as Board's, apart from safe_spots_left (see below)
+        self.num_safe = None  # how many spots aren't bombs, once it's been worked out
+        self.num_safe_dug = 0
+
+    # Pass a seed to get the same board every time, and a safe_spot to keep that spot & its neighbours free of bombs
+    def make_new_board(self, seed=None, safe_spot=None):
+        if seed is None:
+            seed = random.randrange(2 ** 63)
+        self.seed = seed
+        self.safe_spot = safe_spot
+        self.tiles = OrderedDict()
+        self.cold_tiles = {}
+        self.bomb_masks = OrderedDict()
+        self.num_dug = 0
+        self.num_flags = 0
+        self.num_safe = None
+        self.num_safe_dug = 0
+        self.exploded = False
+        self.unfinished_digs = OrderedDict()
+        self.dug_changes += 1
+        self.cursor = safe_spot or (0, 0)
+        self.view = None
+        self.follow_cursor = True
+        self.clear_render_cache()
+
+    def reset_board(self):
+        super().reset_board()
+        self.tiles = OrderedDict()
+        self.cold_tiles = {}
+        self.bomb_masks = OrderedDict()
+        self.unfinished_digs = OrderedDict()
+
+    # Working out how many safe spots there are means generating the bombs for every tile that isn't a plain full tile
+    # (the ones along the right & bottom edges, and the ones around the safe spot), which takes a while on a huge
+    # board, so it's only done the first time something asks. An endless board never runs out of safe spots.
+    @property
+    def safe_spots_left(self):
+        if self.dim_size is None:
+            return math.inf
+        if self.num_safe is None:
+            self.num_safe = self.count_safe_spots()
+        return self.num_safe - self.num_safe_dug
+
+    @safe_spots_left.setter
+    def safe_spots_left(self, value):
+        # Board.__init__() and reset_board() set this, but here it's always worked out from the counts above
+        pass
+
+    # The number of bombs is worked out the same way (None on an endless board)
+    @property
+    def num_bombs(self):
+        if self.dim_size is None:
+            return None
+        if self.num_safe is None:
+            self.num_safe = self.count_safe_spots()
+        return self.dim_size ** 2 - self.num_safe
+
+    @num_bombs.setter
+    def num_bombs(self, value):
+        # Board.__init__() sets this, but the bombs come from bomb_density
+        pass
+
+    def count_safe_spots(self):
+        size = self.tile_size
+        full_tiles, leftover = divmod(self.dim_size, size)
+        bombs_per_tile = round(self.bomb_density * size * size)  # tile_bombs() always samples exactly this many
+
+        # Every full tile has bombs_per_tile bombs, apart from the ones that had bombs taken out around the safe spot
+        bombs = full_tiles * full_tiles * bombs_per_tile
+        uneven = set()
+        if self.safe_spot is not None:
+            safe_row, safe_col = self.safe_spot
+            uneven = {((safe_row + dr) // size, (safe_col + dc) // size) for dr in (-1, 1) for dc in (-1, 1)}
+            uneven = {key for key in uneven if key[0] < full_tiles and key[1] < full_tiles and min(key) >= 0}
+        for key in uneven:
+            bombs += sum(self.tile_bombs(*key)) - bombs_per_tile
+        # The tiles that hang off the right & bottom edges only have some of their bombs on the board
+        if leftover:
+            edge_tiles = {(full_tiles, t) for t in range(full_tiles + 1)} | {(t, full_tiles) for t in range(full_tiles)}
+            bombs += sum(sum(self.tile_bombs(*key)) for key in edge_tiles)
+        return self.dim_size ** 2 - bombs
+
+    def on_board(self, row, col):
+        return self.dim_size is None or (0 <= row < self.dim_size and 0 <= col < self.dim_size)
+
+    # --- Tiles
+    # Returns the 0/1 bomb mask of a tile, generating it from the seed if it isn't cached
+    def tile_bombs(self, tile_row, tile_col):
+        key = (tile_row, tile_col)
+        mask = self.bomb_masks.get(key)
+        if mask is not None:
+            self.bomb_masks.move_to_end(key)
+            return mask
+
+        size = self.tile_size
+        rng = random.Random(f"{self.seed}:{tile_row}:{tile_col}")
+        mask = bytearray(size * size)
+        for i in rng.sample(range(size * size), round(self.bomb_density * size * size)):
+            mask[i] = 1
+
+        # Take out any bombs that are off the edge of the board or too close to the safe spot
+        top, left = tile_row * size, tile_col * size
+        if self.dim_size is not None:
+            first_col, last_col = max(0, -left), min(size, self.dim_size - left)
+            for r in range(size):
+                if not 0 <= top + r < self.dim_size or first_col >= last_col:
+                    mask[r * size:(r + 1) * size] = bytes(size)
+                    continue
+                mask[r * size:r * size + first_col] = bytes(first_col)
+                mask[r * size + last_col:(r + 1) * size] = bytes(size - last_col)
+        if self.safe_spot is not None:
+            safe_row, safe_col = self.safe_spot
+            for r in range(safe_row - 1, safe_row + 2):
+                for c in range(safe_col - 1, safe_col + 2):
+                    if top <= r < top + size and left <= c < left + size:
+                        mask[(r - top) * size + (c - left)] = 0
+
+        mask = bytes(mask)
+        self.bomb_masks[key] = mask
+        # Masks are cheap to regenerate, so just keep a few per full tile (a tile needs its 8 neighbours' masks)
+        while len(self.bomb_masks) > 4 * self.max_tiles + 9:
+            self.bomb_masks.popitem(last=False)
+        return mask
+
+    # Returns a tile's spots, building it if it isn't in memory
+    def tile(self, tile_row, tile_col):
+        key = (tile_row, tile_col)
+        cells = self.tiles.get(key)
+        if cells is not None:
+            self.tiles.move_to_end(key)
+            return cells
+
+        cells = self.build_tile(tile_row, tile_col)
+        cold = self.cold_tiles.pop(key, None)
+        if cold is not None:
+            dug_bits, flagged_bits = cold
+            spots = self.tile_size ** 2
+            cells = bytearray(map(or_, cells, format(dug_bits, f'0{spots}b').encode().translate(BIT_TO_DUG)))
+            cells = bytearray(map(or_, cells, format(flagged_bits, f'0{spots}b').encode().translate(BIT_TO_FLAGGED)))
+        self.tiles[key] = cells
+        self.evict_tiles()
+        return cells
+
+    # Works out a tile's bombs and surrounding-bomb counts. The counts are done the same way as
+    # Board.assign_values_to_board(), on the tile's bomb mask with a 1-spot border taken from the neighbouring tiles.
+    def build_tile(self, tile_row, tile_col):
+        size = self.tile_size
+        masks = {(dr, dc): self.tile_bombs(tile_row + dr, tile_col + dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)}
+
+        def padded_row(dr, r):
+            start = r * size
+            return (masks[dr, -1][start + size - 1:start + size] + masks[dr, 0][start:start + size]
+                    + masks[dr, 1][start:start + 1])
+
+        padded = [padded_row(-1, size - 1)] + [padded_row(0, r) for r in range(size)] + [padded_row(1, 0)]
+        row_sums = [bytes(map(add, map(add, row, row[1:]), row[2:])) for row in padded]
+
+        bombs = masks[0, 0]
+        counts = bytearray()
+        for r in range(size):
+            counts += bytes(map(sub, map(add, map(add, row_sums[r], row_sums[r + 1]), row_sums[r + 2]),
+                                bombs[r * size:(r + 1) * size]))
+        return bytearray(map(or_, counts, bombs.translate(MASK_TO_BOMB)))
+
+    # Keep at most max_tiles tiles in memory, packing the dug & flagged spots of the ones that get evicted. This runs
+    # every time a tile is built, even part way through a dig, so a big dig never holds more than max_tiles tiles. The
+    # tile that was just built is the most recently used one, so it's never the one evicted, and everything that
+    # changes a tile does it straight after looking it up (before building any other tile).
+    def evict_tiles(self):
+        while len(self.tiles) > self.max_tiles:
+            key, cells = self.tiles.popitem(last=False)
+            dug_bits = int(cells.translate(DUG_TO_BIT), 2)
+            flagged_bits = int(cells.translate(FLAGGED_TO_BIT), 2)
+            if dug_bits or flagged_bits:
+                self.cold_tiles[key] = (dug_bits, flagged_bits)
+
+    # Returns the tile holding a spot and the spot's index in it
+    def locate(self, row, col):
+        tile_row, r = divmod(row, self.tile_size)
+        tile_col, c = divmod(col, self.tile_size)
+        return self.tile(tile_row, tile_col), r * self.tile_size + c
+
+    # --- Spots
+    def is_bomb(self, row, col):
+        cells, i = self.locate(row, col)
+        return bool(cells[i] & BOMB)
+
+    def is_flagged(self, row, col):
+        cells, i = self.locate(row, col)
+        return bool(cells[i] & FLAGGED)
+
+    def is_dug(self, row, col):
+        cells, i = self.locate(row, col)
+        return bool(cells[i] & DUG)
+
+    def surrounding_bombs(self, row, col):
+        cells, i = self.locate(row, col)
+        return cells[i] & COUNT_MASK
+
+    # Same flood fill as Board.dig_region(), but spots are looked up through their tiles, and one dig opens at most
+    # about max_reveal spots. A dig that stops there is kept in unfinished_digs, and digging the same spot again
+    # carries on where it left off, so a huge empty region can still be opened up a piece at a time without one dig
+    # using unbounded time & memory. Digging any other dug spot with no surrounding bombs carries on with the most
+    # recent unfinished dig (there's nothing else left to dig around a spot like that).
+    def dig_region(self, row, col):
+        if not self.on_board(row, col):
+            raise ValueError(f"({col}, {row}) isn't on the board.")
+        cells, i = self.locate(row, col)
+        self.cursor, self.follow_cursor = (row, col), True
+        if cells[i] & DUG:
+            if cells[i] & (BOMB | COUNT_MASK):
+                return set()
+            newly_dug = []
+        else:
+            cells[i] |= DUG
+            newly_dug = [(row, col)]
+        hit_bomb = bool(newly_dug) and bool(cells[i] & BOMB)
+
+        start = (row, col)
+        to_dig_around = [] if cells[i] & (BOMB | COUNT_MASK) else [start]
+        if not newly_dug and start in self.unfinished_digs:
+            to_dig_around = self.unfinished_digs.pop(start)
+        elif not newly_dug and self.unfinished_digs:
+            start, to_dig_around = self.unfinished_digs.popitem()
+        while to_dig_around and len(newly_dug) < self.max_reveal:
+            r, c = to_dig_around.pop()
+            for surrounding_row in (r - 1, r, r + 1):
+                for surrounding_col in (c - 1, c, c + 1):
+                    if not self.on_board(surrounding_row, surrounding_col):
+                        continue
+                    cells, i = self.locate(surrounding_row, surrounding_col)
+                    if cells[i] & DUG:
+                        continue
+                    cells[i] |= DUG
+                    newly_dug.append((surrounding_row, surrounding_col))
+                    if not cells[i] & COUNT_MASK:
+                        to_dig_around.append((surrounding_row, surrounding_col))
+
+        if to_dig_around:
+            self.unfinished_digs[start] = to_dig_around
+        if not newly_dug:
+            return set()
+
+        # Keep the counters up to date. Only the first spot can be a bomb, since we never dig around a numbered spot.
+        self.num_dug += len(newly_dug)
+        self.num_safe_dug += len(newly_dug) - hit_bomb
+        self.exploded = self.exploded or hit_bomb
+        self.dug_changes += 1
+        return set(newly_dug)
+
+    def flag_spot(self, row, col):
+        if not self.on_board(row, col):
+            raise ValueError(f"({col}, {row}) isn't on the board.")
+        cells, i = self.locate(row, col)
+        if not cells[i] & FLAGGED:
+            cells[i] |= FLAGGED
+            self.num_flags += 1
+        self.cursor, self.follow_cursor = (row, col), True
+        return True
+
+    # Un-digs every spot (leaving the flags where they are), the same as Board.clear_dug()
+    def clear_dug(self):
+        for cells in self.tiles.values():
+            cells[:] = cells.translate(CLEAR_DUG_TABLE)
+        self.cold_tiles = {key: (0, flagged_bits) for key, (_, flagged_bits) in self.cold_tiles.items() if flagged_bits}
+        self.num_dug = 0
+        self.num_safe_dug = 0
+        self.exploded = False
+        self.unfinished_digs = OrderedDict()
+        self.dug_changes += 1
+        self.clear_render_cache()
+
+    def surrounding_spots(self, row, col):
+        return [(surrounding_row, surrounding_col)
+                for surrounding_row in (row - 1, row, row + 1) for surrounding_col in (col - 1, col, col + 1)
+                if (surrounding_row, surrounding_col) != (row, col) and self.on_board(surrounding_row, surrounding_col)]
+
+    def get_num_surrounding_bombs(self, row, col):
+        return self.surrounding_bombs(row, col)
+
+    # --- Board methods that don't work on a chunked board
+    # The bombs come from the seed, spots don't have an index into one flat array, and moves aren't journalled, so
+    # these raise instead of quietly doing the wrong thing
+    def index(self, row, col):
+        raise NotImplementedError("Spots on a chunked board don't have an index, since there's no flat array of them.")
+
+    def assign_values_to_board(self):
+        raise NotImplementedError("Chunked boards count the bombs around each spot a tile at a time, as it's built.")
+
+    def add_bomb(self, row, col):
+        raise NotImplementedError("A chunked board's bombs come from its seed, so they can't be moved.")
+
+    def remove_bomb(self, row, col):
+        self.add_bomb(row, col)
+
+    def move_bomb(self, from_row, from_col, to_row, to_col):
+        self.add_bomb(from_row, from_col)
+
+    def undo(self):
+        self.snapshot()
+
+    def redo(self):
+        self.snapshot()
+
+    def snapshot(self):
+        raise NotImplementedError("Chunked boards don't keep a history, so moves can't be undone or rolled back.")
+
+    def restore(self, token):
+        self.snapshot()
+
+    # --- Printing
+    # There's far too much board to print all of it, so always print just the part of it that fits on the screen
+    # (see Board.render_viewport())
+    def __str__(self):
+        height, width = self.viewport_size()
+        return self.render_viewport(*self.view_origin(height, width), height, width)
+
+    # Same as Board.row_cells(), but the row is pieced together from the tiles it crosses. The tiles' bytes already
+    # have the dug & flagged bits in them, and once the board's being revealed every spot is shown as dug.
+    def row_cells(self, r, left, width):
+        row_cells = bytearray()
+        c = left
+        while c < left + width:
+            cells, i = self.locate(r, c)
+            take = min(self.tile_size - c % self.tile_size, left + width - c)
+            row_cells += cells[i:i + take]
+            c += take
+        if self.revealing_all:
+            return row_cells.translate(REVEAL_TABLE)
+        return row_cells
@@ -0,0 +1,284 @@
+import argparse
+import json
+import os
+import random
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from chunked import ChunkedBoard
+from main import Board
+from neighbours import TOPOLOGIES
+from probability import probability_policy
+from solver import solver_policy
+
+# This is a headless version of the game: it drives a Board from code with no input(), print() or sleep() calls, so
+# games can be played by other programs (solvers, simulators, servers, tests) as fast as the Board allows.
+
+
+class Game:
+    def __init__(self, dim_size, num_bombs, seed=None, safe_first_dig=True, topology='square', move_log=None,
+                 no_guess=False, no_guess_workers=None, chunked=False):
+        if dim_size <= 0:
+            raise ValueError("dim_size has to be greater than 0.")
+        if num_bombs <= 0 or num_bombs >= dim_size ** 2:
+            raise ValueError(f"num_bombs has to be greater than 0 but less than {dim_size ** 2}.")
+
+        # Chunked boards (see chunked.py) only build the parts of the board that get used, so they can be far bigger
+        # than a normal board (100k x 100k is fine). Their bombs are spread a tile at a time at the density num_bombs
+        # works out to, so the board can end up with slightly more or fewer than num_bombs.
+        if chunked:
+            if topology != 'square' or no_guess or move_log is not None:
+                raise ValueError("Chunked boards have to be square, and can't be no-guess boards or be logged.")
+            self.board = ChunkedBoard(dim_size, bomb_density=num_bombs / dim_size ** 2)
+        else:
+            self.board = Board()
+            self.board.dim_size = dim_size
+            self.board.num_bombs = num_bombs
+        self.num_bombs = num_bombs
+        self.board.topology = topology
+        self.board.move_log = move_log  # a movelog.MoveLog to record the game to, if any
+        # No-guess boards (see noguess.py) need a first dig to be solved from, so they only work with safe_first_dig
+        if no_guess and not safe_first_dig:
+            raise ValueError("No-guess boards are built around the first dig, so they need safe_first_dig=True.")
+        self.board.no_guess = no_guess
+        self.board.no_guess_workers = no_guess_workers
+
+        # Pick the seed up front (instead of letting make_new_board() do it) so status() can report it before the
+        # first dig, which matters when the board isn't built until then
+        self.seed = seed if seed is not None else random.randrange(2 ** 63)
+
+        # If safe_first_dig is True, the board isn't built until the first dig so the bombs can be kept away from it
+        self.safe_first_dig = safe_first_dig
+        # Flags made before then are kept here (in the order they were made) and put on the board once it's built, so
+        # flagging first doesn't build the board early & lose the safe first dig
+        self.pending_flags = {}  # (row, col) -> None
+        self.built = False
+        if not safe_first_dig:
+            self.build_board(None)
+
+        self.state = 'playing'  # 'playing', 'won' or 'lost'
+        self.moves = 0
+        self.last_dug = set()  # the spots dug by the last dig, so policies can keep their own state up to date
+
+    # Digs a spot and returns the set of (row, col) spots that were dug by it
+    def dig(self, row, col):
+        self.check_move(row, col)
+        if not self.built:
+            self.build_board((row, col))
+
+        newly_dug = self.last_dug = self.board.dig_region(row, col)
+        self.moves += 1
+        if self.board.game_lost():
+            self.state = 'lost'
+        elif self.board.game_won():
+            self.state = 'won'
+        return newly_dug
+
+    # Flags a spot. Returns True if the spot wasn't already flagged. Raises ValueError if the spot's been dug, the same
+    # as play() won't let a dug spot be picked.
+    def flag(self, row, col):
+        self.check_move(row, col)
+        if self.built and self.board.is_dug(row, col):
+            raise ValueError(f"({col}, {row}) has already been dug.")
+        if not self.built:
+            already_flagged = (row, col) in self.pending_flags
+            self.pending_flags[row, col] = None
+            self.moves += 1
+            return not already_flagged
+
+        already_flagged = self.board.is_flagged(row, col)
+        self.board.flag_spot(row, col)
+        self.moves += 1
+        return not already_flagged
+
+    # Makes the board (keeping the safe spot & its neighbours free of bombs) and puts down any flags made before then
+    def build_board(self, safe_spot):
+        self.board.make_new_board(self.seed, safe_spot)
+        self.built = True
+        for spot in self.pending_flags:
+            self.board.flag_spot(*spot)
+        self.pending_flags.clear()
+
+    def status(self):
+        board = self.board
+        # Before the first dig the board hasn't been built yet, so every safe spot is still left
+        if self.built:
+            num_bombs, safe_spots_left, num_flags = board.num_bombs, board.safe_spots_left, board.num_flags
+        else:
+            num_bombs, num_flags = self.num_bombs, len(self.pending_flags)
+            safe_spots_left = board.dim_size ** 2 - num_bombs
+        return {'state': self.state, 'moves': self.moves, 'seed': self.seed, 'dim_size': board.dim_size,
+                'num_bombs': num_bombs, 'dug': board.num_dug, 'flags': num_flags,
+                'safe_spots_left': safe_spots_left}
+
+    # Helper for dig() and flag() that makes sure the game is still going and the spot is on the board
+    def check_move(self, row, col):
+        if self.state != 'playing':
+            raise ValueError(f"The game is over (you {self.state}).")
+        if not (0 <= row < self.board.dim_size and 0 <= col < self.board.dim_size):
+            raise ValueError(f"({col}, {row}) isn't on the board.")
+
+
+def new_game(dim_size, num_bombs, seed=None, safe_first_dig=True, topology='square', no_guess=False, chunked=False):
+    return Game(dim_size, num_bombs, seed, safe_first_dig, topology, no_guess=no_guess, chunked=chunked)
+
+
+# --- Move policies
+# A move policy is a function that takes a Game and a random.Random and returns the next move as an
+# (action, row, col) tuple, where action is 'dig' or 'flag'. Policies are looked up by name in POLICIES so the batch
+# simulator can send them to its worker processes.
+
+# Digs a random spot that hasn't been dug or flagged yet
+def random_policy(game, rng):
+    board = game.board
+    dim = board.dim_size
+    # Guess a few times first since that's quick while most of the board is still undug...
+    for _ in range(32):
+        row, col = rng.randrange(dim), rng.randrange(dim)
+        if not game.built or not (board.is_dug(row, col) or board.is_flagged(row, col)):
+            return 'dig', row, col
+    # ...and otherwise pick from the spots that are actually left
+    size = dim ** 2
+    spots_left = [divmod(i, dim) for i, (dug, flagged) in enumerate(zip(board.dug.spread(0, size, 1),
+                                                                        board.flags.spread(0, size, 1)))
+                  if not dug and not flagged]
+    return ('dig',) + rng.choice(spots_left)
+
+
+POLICIES = {'random': random_policy, 'solver': solver_policy, 'probability': probability_policy}
+
+
+# Plays a game until it's won or lost (or max_moves is hit) and returns a dict describing how it went
+def play_game(game, policy, rng, max_moves=None):
+    reveal_sizes = []
+    while game.state == 'playing' and (max_moves is None or game.moves < max_moves):
+        action, row, col = policy(game, rng)
+        if action == 'dig':
+            reveal_sizes.append(len(game.dig(row, col)))
+        else:
+            game.flag(row, col)
+    return {'state': game.state, 'moves': game.moves, 'reveal_sizes': reveal_sizes}
+
+
+# --- Batch simulator
+# Runs `count` games on one worker process and returns the combined stats for all of them. Game i uses the seed
+# first_seed + i, so any game in a batch can be replayed on its own.
+def simulate_chunk(dim_size, num_bombs, first_seed, count, policy_name, max_moves=None, topology='square',
+                   no_guess=False, chunked=False):
+    policy = POLICIES[policy_name]
+    totals = empty_totals()
+    for seed in range(first_seed, first_seed + count):
+        # Each chunk already has a process to itself, so no-guess boards are searched for in this process too
+        game = Game(dim_size, num_bombs, seed, topology=topology, no_guess=no_guess, no_guess_workers=1,
+                    chunked=chunked)
+        add_game_to_totals(totals, play_game(game, policy, random.Random(seed), max_moves))
+    return totals
+
+
+def empty_totals():
+    # reveal_histogram counts digs by how many spots they opened, bucketed by powers of 2 (bucket k is < 2**k spots)
+    return {'games': 0, 'wins': 0, 'losses': 0, 'unfinished': 0, 'moves': 0, 'digs': 0, 'spots_dug': 0,
+            'max_reveal': 0, 'reveal_histogram': {}}
+
+
+def add_game_to_totals(totals, result):
+    totals['games'] += 1
+    totals[{'won': 'wins', 'lost': 'losses', 'playing': 'unfinished'}[result['state']]] += 1
+    totals['moves'] += result['moves']
+    for size in result['reveal_sizes']:
+        totals['digs'] += 1
+        totals['spots_dug'] += size
+        totals['max_reveal'] = max(totals['max_reveal'], size)
+        bucket = str(size.bit_length())
+        totals['reveal_histogram'][bucket] = totals['reveal_histogram'].get(bucket, 0) + 1
+
+
+def merge_totals(totals, more):
+    for key in ('games', 'wins', 'losses', 'unfinished', 'moves', 'digs', 'spots_dug'):
+        totals[key] += more[key]
+    totals['max_reveal'] = max(totals['max_reveal'], more['max_reveal'])
+    for bucket, count in more['reveal_histogram'].items():
+        totals['reveal_histogram'][bucket] = totals['reveal_histogram'].get(bucket, 0) + count
+
+
+def summarize(totals):
+    games, digs = totals['games'], totals['digs']
+    return dict(totals, win_rate=totals['wins'] / games if games else 0.0,
+                moves_per_game=totals['moves'] / games if games else 0.0,
+                mean_reveal=totals['spots_dug'] / digs if digs else 0.0)
+
+
+# Runs num_games games across a pool of worker processes. The games are split into chunks of chunk_size; as each
+# chunk finishes, its stats are written as one JSON line to `out` (a file object, if given) so a long run can be
+# watched (or picked up) while it's going. Only a few chunks per worker are in flight at once, so a run of millions of
+# games doesn't queue up millions of futures. Returns the summary of all the games combined.
+def simulate(num_games, dim_size, num_bombs, policy='random', seed=0, workers=None, chunk_size=1000, out=None,
+             max_moves=None, topology='square', no_guess=False, chunked=False):
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy '{policy}'. Choose from: {', '.join(POLICIES)}.")
+    # The solver works on a whole board at once, so only random guessing works on a chunked board
+    if chunked and policy != 'random':
+        raise ValueError("Chunked boards can only be played with the random policy.")
+
+    workers = workers or os.cpu_count() or 1
+    totals = empty_totals()
+    chunks = ((seed + start, min(chunk_size, num_games - start)) for start in range(0, num_games, chunk_size))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        max_in_flight = workers * 4
+        in_flight = {}
+        while True:
+            for first_seed, count in chunks:
+                future = executor.submit(simulate_chunk, dim_size, num_bombs, first_seed, count, policy, max_moves,
+                                         topology, no_guess, chunked)
+                in_flight[future] = first_seed
+                if len(in_flight) >= max_in_flight:
+                    break
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk_totals = future.result()
+                merge_totals(totals, chunk_totals)
+                if out is not None:
+                    out.write(json.dumps(dict(chunk_totals, first_seed=in_flight[future])) + "\n")
+                    out.flush()
+                del in_flight[future]
+
+    summary = summarize(totals)
+    if out is not None:
+        out.write(json.dumps({'summary': summary}) + "\n")
+        out.flush()
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a batch of headless Minesweeper games across processes.")
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--dim', type=int, default=9)
+    parser.add_argument('--bombs', type=int, default=10)
+    parser.add_argument('--policy', default='random', choices=sorted(POLICIES))
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game (game i uses seed + i)")
+    parser.add_argument('--workers', type=int, default=None, help="number of processes (default: one per CPU)")
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--max-moves', type=int, default=None)
+    parser.add_argument('--topology', default='square', choices=TOPOLOGIES)
+    parser.add_argument('--no-guess', action='store_true', help="only play boards that can be solved without guessing")
+    parser.add_argument('--chunked', action='store_true',
+                        help="play on chunked boards, which only build the parts that get used (for huge boards)")
+    parser.add_argument('--out', default=None, help="file to stream per-chunk JSON lines to")
+    args = parser.parse_args(argv)
+
+    out = open(args.out, 'w') if args.out else None
+    try:
+        summary = simulate(args.games, args.dim, args.bombs, args.policy, args.seed, args.workers, args.chunk_size,
+                           out, args.max_moves, args.topology, args.no_guess, args.chunked)
+    finally:
+        if out is not None:
+            out.close()
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
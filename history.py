@@ -0,0 +1,111 @@
+from array import array
+
+from main import BOMB
+
+# Undo & redo for a Board, plus snapshots that can be rolled back to. Instead of copying the board's state, the history
+# keeps a journal with one entry per dig or flag that changed something: what kind of move it was and the indices of
+# the spots it changed. Everything else a move changes (num_dug, num_flags, safe_spots_left, exploded) follows from
+# those spots, so undoing or redoing a move only touches the spots it changed, however big the board is.
+#
+# Turn it on with board.history = History() (or just call board.snapshot(), which does that if it's off). Making a new
+# board clears it.
+#
+#   token = board.snapshot()
+#   board.dig_region(3, 4)          # try something out...
+#   board.restore(token)            # ...and roll it back
+
+DIG = 0
+FLAG = 1
+
+
+class History:
+    def __init__(self):
+        self.entries = []  # (DIG or FLAG, array of the indices of the spots that changed)
+        self.position = 0  # how many entries are applied to the board right now; the ones after it can be redone
+
+    # Board.dig_region() and Board.flag_spot() call these for every move that changes something
+    def record_dig(self, indices):
+        self.record(DIG, indices)
+
+    def record_flag(self, index):
+        self.record(FLAG, (index,))
+
+    # Adds a move that was just made. Anything that could have been redone is dropped, since it came after a move that's
+    # now been undone.
+    def record(self, kind, indices):
+        del self.entries[self.position:]
+        self.entries.append((kind, array('i', indices)))
+        self.position += 1
+
+    def clear(self):
+        self.entries = []
+        self.position = 0
+
+    def can_undo(self):
+        return self.position > 0
+
+    def can_redo(self):
+        return self.position < len(self.entries)
+
+    # Undoes the last move on the board. Returns the (row, col) of the spot that move was made at, or None if there's
+    # nothing to undo.
+    def undo(self, board):
+        if not self.can_undo():
+            return None
+        self.position -= 1
+        kind, indices = self.entries[self.position]
+        apply(board, kind, indices, undo=True)
+        return divmod(indices[0], board.dim_size)
+
+    # Makes the last undone move again. Returns its (row, col), or None if there's nothing to redo.
+    def redo(self, board):
+        if not self.can_redo():
+            return None
+        kind, indices = self.entries[self.position]
+        self.position += 1
+        apply(board, kind, indices, undo=False)
+        return divmod(indices[0], board.dim_size)
+
+    # A token for the board as it is now, for restore(). It's the number of moves applied plus the last of them, so a
+    # token from a line of moves that has since been undone & replaced by other moves isn't mistaken for a current one.
+    def snapshot(self):
+        return self.position, self.entries[self.position - 1] if self.position else None
+
+    # Undoes moves until the board is back to how it was when the token was made. Raises ValueError if that's not
+    # possible (the token is from moves that were undone and then replaced, or from before the history was cleared).
+    def restore(self, board, token):
+        position, last_entry = token
+        if position > self.position or (self.entries[position - 1] if position else None) is not last_entry:
+            raise ValueError("That snapshot is from moves that aren't in the history any more.")
+        while self.position > position:
+            self.undo(board)
+
+
+# Applies (or undoes) one entry's changes to the board and its counters
+def apply(board, kind, indices, undo):
+    step = -1 if undo else 1
+    if kind == DIG:
+        bits = board.dug.bits
+        for i in indices:
+            if undo:
+                bits[i >> 3] &= ~(1 << (i & 7))
+            else:
+                bits[i >> 3] |= 1 << (i & 7)
+        # Only the first spot of a dig can be a bomb (see Board.dig_region())
+        hit_bomb = bool(board.cells[indices[0]] & BOMB)
+        board.num_dug += step * len(indices)
+        board.dug_changes += 1
+        board.safe_spots_left -= step * (len(indices) - hit_bomb)
+        if hit_bomb:
+            board.exploded = not undo
+    else:
+        for i in indices:
+            if undo:
+                board.flags.discard(i)
+            else:
+                board.flags.add(i)
+        board.num_flags += step * len(indices)
+
+    dim = board.dim_size
+    board.cursor, board.follow_cursor = divmod(indices[0], dim), True
+    board.mark_rows_changed({i // dim for i in indices})
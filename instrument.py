@@ -0,0 +1,179 @@
+import json
+import sys
+from functools import wraps
+from time import perf_counter
+
+from neighbours import NeighbourTable
+
+# Instrumentation for the board's hot paths: how often make_new_board(), assign_values_to_board(), dig_spot(),
+# dig_region(), __str__ and play()'s input parsing are called and how long they take, how many spots each dig opens
+# (counted in dig_region(), which every dig goes through: the player's, auto's, the solver's and the engine's), and the
+# most memory the board's structures have taken up. It's built in but off by default, and while it's off it costs
+# nothing at all: enable() swaps those methods & functions for wrapped versions that record each call, and disable()
+# puts the originals back, so there's never a check left behind in the hot paths themselves.
+#
+#   instrument.enable()
+#   ... play some games ...
+#   print(instrument.report())
+#   instrument.save_json('stats.json')
+#
+# In the game, start with --stats (or input 'stats on' at the prompt) and input 'stats' to see the figures so far.
+
+BOARD_METHODS = ('make_new_board', 'assign_values_to_board', 'dig_spot', 'dig_region', '__str__')
+# play()'s input parsing helpers
+INPUT_FUNCTIONS = ('parse_spot', 'parse_moves', 'move_view')
+# After these calls the board's structures may have grown, so their size is checked again
+MEASURED_AFTER = ('make_new_board', 'dig_region', '__str__')
+
+originals = {}  # (object that was patched, name) -> the original method/function, while instrumentation is on
+
+
+def empty_stats():
+    calls = {name: {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0} for name in BOARD_METHODS + INPUT_FUNCTIONS}
+    calls['dig_region'].update(spots_dug=0, max_region=0)
+    return {'calls': calls, 'memory': {'peak_bytes': 0, 'peak_by_structure': {}}}
+
+
+stats = empty_stats()
+
+
+def enabled():
+    return bool(originals)
+
+
+# Turns the instrumentation on. `module` is the module whose Board & input helpers get wrapped, which is main unless
+# the game is being run as a script (in which case play() is running in __main__ instead).
+def enable(module=None):
+    if enabled():
+        return
+    if module is None:
+        import main as module
+
+    for name in BOARD_METHODS:
+        patch(module.Board, name, timed(name, getattr(module.Board, name)))
+    for name in INPUT_FUNCTIONS:
+        patch(module, name, timed(name, getattr(module, name)))
+
+
+def disable():
+    for (owner, name), original in originals.items():
+        setattr(owner, name, original)
+    originals.clear()
+
+
+def reset():
+    stats.update(empty_stats())
+
+
+def patch(owner, name, wrapper):
+    originals[owner, name] = getattr(owner, name)
+    setattr(owner, name, wrapper)
+
+
+# Wraps a method or function so every call to it is counted & timed (plus the extra figures for dig_region and the
+# board's memory after calls that can grow it)
+def timed(name, func):
+    is_dig = name == 'dig_region'
+    measure_after = name in MEASURED_AFTER
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        board = args[0] if is_dig or measure_after else None
+        dug_before = board.num_dug if is_dig else 0
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            record = stats['calls'][name]
+            record['calls'] += 1
+            record['seconds'] += elapsed
+            record['max_seconds'] = max(record['max_seconds'], elapsed)
+            if is_dig:
+                region = board.num_dug - dug_before
+                record['spots_dug'] += region
+                record['max_region'] = max(record['max_region'], region)
+            if measure_after:
+                measure_board(board)
+    return wrapper
+
+
+# Adds up how much memory each of the board's structures is using and keeps the biggest figures seen so far.
+# A neighbour table (torus & hex boards only) is shared by every board of the same size & topology, but it's counted
+# since it's there for this board.
+def measure_board(board):
+    sizes = {'cells': size_of(board.cells)}
+    if board.dug is not None:
+        sizes['dug'] = size_of(board.dug.bits)
+        sizes['flags'] = size_of(board.flags.bits)
+    if isinstance(board.neighbours, NeighbourTable):
+        sizes['neighbour_table'] = size_of(board.neighbours.offsets) + size_of(board.neighbours.indices)
+    if board.rendered_rows is not None:
+        sizes['render_cache'] = size_of_all(board.rendered_rows) + size_of_all(board.rendered_header or ())
+    if board.spot_strings is not None:
+        sizes['spot_strings'] = size_of_all(board.spot_strings)
+
+    memory = stats['memory']
+    peaks = memory['peak_by_structure']
+    for structure, size in sizes.items():
+        peaks[structure] = max(peaks.get(structure, 0), size)
+    memory['peak_bytes'] = max(memory['peak_bytes'], sum(sizes.values()))
+
+
+def size_of(obj):
+    return sys.getsizeof(obj) if obj is not None else 0
+
+
+# The size of a list or tuple plus everything in it
+def size_of_all(items):
+    return sys.getsizeof(items) + sum(map(sys.getsizeof, items))
+
+
+# --- Reporting
+# Everything recorded so far as a dict (a copy, so it can be kept while the stats carry on changing)
+def snapshot():
+    calls = {}
+    for name, record in stats['calls'].items():
+        calls[name] = dict(record, mean_seconds=record['seconds'] / record['calls'] if record['calls'] else 0.0)
+    return {'enabled': enabled(), 'calls': calls,
+            'memory': dict(stats['memory'], peak_by_structure=dict(stats['memory']['peak_by_structure']))}
+
+
+def to_json(indent=2):
+    return json.dumps(snapshot(), indent=indent)
+
+
+def save_json(path):
+    with open(path, 'w') as file:
+        file.write(to_json() + "\n")
+
+
+# The stats as a table for printing
+def report():
+    current = snapshot()
+    lines = [f"{'':<24}{'calls':>8}{'total ms':>12}{'mean ms':>10}{'max ms':>10}"]
+    for section, names in (('Board', BOARD_METHODS), ('Input parsing', INPUT_FUNCTIONS)):
+        lines.append(section)
+        for name in names:
+            record = current['calls'][name]
+            lines.append(f"  {name:<22}{record['calls']:>8}{record['seconds'] * 1000:>12.2f}"
+                         f"{record['mean_seconds'] * 1000:>10.3f}{record['max_seconds'] * 1000:>10.3f}")
+    dig = current['calls']['dig_region']
+    lines.append(f"Spots dug: {dig['spots_dug']} (biggest region: {dig['max_region']})")
+
+    memory = current['memory']
+    structures = ', '.join(f"{structure} {format_bytes(size)}"
+                           for structure, size in memory['peak_by_structure'].items())
+    peak = f"Peak board memory: {format_bytes(memory['peak_bytes'])}"
+    lines.append(f"{peak} ({structures})" if structures else peak)
+    if not current['enabled']:
+        lines.append("(Stats are off at the moment, so these figures aren't changing.)")
+    return "\n".join(lines)
+
+
+def format_bytes(size):
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
@@ -1,8 +1,17 @@
+import argparse
+import atexit
+import contextlib
+import os
 import random
 import re
+import shutil
 import sys
+from itertools import compress
+from operator import add, or_, sub
 from time import sleep
 
+from neighbours import neighbour_table
+
 # This list of acceptable quit responses needs to be accessible globally
 quit_responses = ['quit', 'quit game']
 
@@ -13,6 +22,115 @@ def quit_game():
     sys.exit()
 
 
+# How the game talks to the player, which also needs to be accessible globally. Scripted runs (see run_script()) read
+# their input from a file instead of the keyboard, skip the pauses that give a person time to read, and only print
+# what the script asks for (see tell()).
+class Console:
+    def __init__(self):
+        self.delays = True
+        self.quiet = False
+        self.script = None  # A file to read input from (one line per answer) instead of the keyboard
+        self.out = None  # Where output the player asked for goes (None = sys.stdout), even when quiet
+
+
+console = Console()
+
+
+# Waits a moment so the player can keep up with what's being printed (unless the delays are turned off)
+def pause(seconds):
+    if console.delays:
+        sleep(seconds)
+
+
+# Reads the player's next answer, from the script if there is one. Running out of input quits the game.
+def ask(prompt="> "):
+    if console.script is None:
+        try:
+            return input(prompt)
+        except EOFError:
+            quit_game()
+    line = console.script.readline()
+    if not line:
+        quit_game()
+    line = line.rstrip("\n")
+    if not console.quiet:
+        print(prompt + line)
+    return line
+
+
+# Prints something the player asked for (a hint, the board, the answer to a command) or needs to know about what they
+# just typed (like why it wasn't accepted). Unlike everything else, this still gets printed when the game's being quiet.
+def tell(message):
+    print(message, file=console.out)
+
+
+# Prints the board, unless the game's being quiet. (Printing a board means rendering it, which is the slowest part of a
+# move on a big board, so quiet runs skip it altogether rather than printing it to nowhere.)
+def show_board(game_board):
+    if not console.quiet:
+        print(game_board)
+
+
+# Each spot on the board is packed into a single byte of Board.cells so that even a huge board only costs one byte per
+# spot. The low 4 bits hold the number of surrounding bombs (0-8) and the next bit marks whether the spot is a bomb.
+# Whether a spot has been dug or flagged is kept in Board.dug and Board.flags (bitsets with one bit per spot), but when
+# a spot is printed its byte gets the FLAGGED and DUG bits added in so that every way a spot can look is one byte value.
+COUNT_MASK = 0x0F
+BOMB = 0x10
+FLAGGED = 0x20
+DUG = 0x40
+
+# Translation tables used to transform every spot on the board in one go: REVEAL_TABLE marks a spot as dug (see
+# Board.reveal_board()), BOMB_TABLE turns a spot into 1 if it's a bomb and 0 if not, and CLEAR_COUNT_TABLE wipes the
+# spot's surrounding bombs count (see Board.assign_values_to_board())
+REVEAL_TABLE = bytes(b | DUG for b in range(256))
+BOMB_TABLE = bytes(1 if b & BOMB else 0 for b in range(256))
+CLEAR_COUNT_TABLE = bytes(b & ~COUNT_MASK for b in range(256))
+
+
+# A fixed-size set of spot indices stored as one bit per spot (so a 1000x1000 board's dug spots take 125 KB instead of
+# a set of a million tuples). Bit i lives in bit (i % 8) of byte (i // 8).
+class Bitset:
+    def __init__(self, size, bits=None):
+        self.size = size
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+
+    def __contains__(self, i):
+        return self.bits[i >> 3] >> (i & 7) & 1 == 1
+
+    def add(self, i):
+        self.bits[i >> 3] |= 1 << (i & 7)
+
+    def discard(self, i):
+        self.bits[i >> 3] &= ~(1 << (i & 7))
+
+    def __len__(self):
+        return int.from_bytes(self.bits, 'little').bit_count()
+
+    # Goes through the indices of the set bits in order, skipping over empty bytes
+    def __iter__(self):
+        bits = self.bits
+        for byte_index in range(len(bits)):
+            byte = bits[byte_index]
+            while byte:
+                low_bit = byte & -byte
+                yield byte_index * 8 + low_bit.bit_length() - 1
+                byte ^= low_bit
+
+    # Returns `length` bytes, one for each bit starting from bit `start`, where set bits become `value` and clear bits
+    # become 0. This is how a row of dug/flagged bits gets combined with a row of Board.cells for printing.
+    def spread(self, start, length, value):
+        if length <= 0:
+            return b''
+        chunk = int.from_bytes(self.bits[start >> 3:(start + length + 7) >> 3], 'little') >> (start & 7)
+        binary = format(chunk & ((1 << length) - 1), f'0{length}b')[::-1]
+        return binary.encode().translate(SPREAD_TABLES[value])
+
+
+# Translation tables for Bitset.spread(): '1' becomes the given value and '0' becomes 0
+SPREAD_TABLES = {value: bytes(value if b == ord('1') else 0 for b in range(256)) for value in (1, BOMB, FLAGGED, DUG)}
+
+
 class Board:
     def __init__(self):
         # restart_game variable will be set to True if user wants to edit dim/no. of bombs during the game
@@ -23,25 +141,76 @@ class Board:
         self.dim_size = None
         self.num_bombs = None
 
+        # Which spots count as neighbours: 'square' (the normal board), 'torus' (the edges wrap around) or 'hex'
+        # (see neighbours.py). make_new_board() looks up the matching neighbours and keeps them in self.neighbours,
+        # where self.neighbours[i] gives the indices of the spots around spot i.
+        self.topology = 'square'
+        self.neighbours = None
+
         # Set game symbols. All symbols must be len 3 for __str__ function printing.
         # 'no surrounding bombs' is the symbol that prints when a spot is dug up but there aren't any surrounding bombs.
         # You could also just print the spot's 'bombs' value like you would for any other spot--which would be 0--but
         # you'll have to edit __str__ if you want 0 spots to print 0 instead of the 'no surrounding bombs' symbol.
         self.symbols = {'bomb': ' X ', 'undug spot': ' - ', 'no surrounding bombs': '   ', 'flag': ' • '}
 
-        # Initialize board to None and we'll run Board.make_new_board() at the top of each game so a new board is
-        # created each time.
-        self.board = None
-
-        # Initialize a set to keep track of which locations have been dug using (row, col) tuples.
-        # I didn't set 'is dug' as one of the keys in each 'spot' because the game needs to be able to compare the
-        # length of Board.dug to (board size - num. bombs) to check if the player has dug up all of the safe spots.
-        self.dug = set()  # if we dig at 0,0, then self.dug = {(0,0)}
+        # Initialize the board's cells to None and we'll run Board.make_new_board() at the top of each game so a new
+        # board is created each time. Spot (row, col) lives at index row * dim_size + col (see Board.index()).
+        self.cells = None
+
+        # Bitsets of the spots that have been dug and the spots that have been flagged (see Bitset)
+        self.dug = None
+        self.flags = None
+
+        # Keep running counts so the game never has to count the dug/flagged spots to see where it's at: the game is
+        # won as soon as safe_spots_left hits 0 and lost as soon as a bomb is dug (exploded).
+        self.num_dug = 0
+        self.num_flags = 0
+        self.safe_spots_left = 0
+        self.exploded = False
+
+        # Goes up every time the dug spots change (a dig that dug something, an undo or redo, a new or loaded board), so
+        # anything keeping its own picture of the dug spots, like the solver, can tell when it's out of date. num_dug
+        # can't be used for that, since undoing one dig and making another can leave it the same.
+        self.dug_changes = 0
+
+        # When this is True the board is printed as if every spot had been dug (see reveal_board())
+        self.revealing_all = False
+
+        # The seed the current board was generated from, plus the spot (if any) that was kept free of bombs so that the
+        # first dig is safe. Together with the dim size & num bombs, these are enough to rebuild the exact same board.
+        self.seed = None
+        self.safe_spot = None
+
+        # Cached pieces of the printed board (see __str__): the header, one string per row, the rows that have changed
+        # since the last print, and the string for each possible spot byte value (which depends on the symbols)
+        self.rendered_header = None
+        self.rendered_rows = None
+        self.rows_to_render = set()
+        self.spot_strings = None
+
+        # Boards too big for the screen only print the part of the board around the cursor (the last spot that was
+        # dug or flagged). view is the (top row, left col) of the part that's on screen. Panning or jumping somewhere
+        # else stops the view from following the cursor until the next dig or flag (see view_origin()).
+        self.cursor = (0, 0)
+        self.view = None
+        self.follow_cursor = True
+
+        # If this is set to a MoveLog (see movelog.py), every new board, dig and flag gets written to it
+        self.move_log = None
+
+        # If this is set to a History (see history.py), every dig & flag that changes something is journalled so it
+        # can be undone & redone, and the board can be rolled back to a snapshot
+        self.history = None
+
+        # In no-guess mode, boards made with a safe spot can always be finished from there without guessing (see
+        # noguess.py). no_guess_workers is how many processes to search for one with (None = one per CPU).
+        self.no_guess = False
+        self.no_guess_workers = None
 
     def set_dim_size(self):
         print("\nWhat size square board would you like to play on? (e.g. enter '10' for a 10x10 board).")
         while True:
-            dimension_input = input("> ").lower().strip()
+            dimension_input = ask("> ").lower().strip()
             try:
                 # Check if user wants to quit
                 if dimension_input in quit_responses:
@@ -57,7 +226,7 @@ class Board:
                 break
 
             except ValueError:
-                print("Please enter an integer that is greater than 0 and less than 1000.")
+                tell("Please enter an integer that is greater than 0 and less than 1000.")
 
     def set_num_bombs(self):
         # Level suggestions: Easy: 10-15% of the board is bombs, Med: 15-25%, Hard: 25-35%
@@ -69,7 +238,7 @@ class Board:
               f"\n  For a hard game, I'd suggest: "
               f"{((self.dim_size ** 2) * 25 // 100) + 1} - {(self.dim_size ** 2) * 35 // 100} bombs.")
         while True:
-            bombs_input = input("> ").lower().strip()
+            bombs_input = ask("> ").lower().strip()
             try:
                 # Check if user wants to quit
                 if bombs_input in quit_responses:
@@ -85,167 +254,487 @@ class Board:
                 break
 
             except ValueError:
-                print(f"Please enter an integer that is greater than 0 but less than {self.dim_size ** 2}.")
+                tell(f"Please enter an integer that is greater than 0 but less than {self.dim_size ** 2}.")
 
     # Call this function at the start of each game to create a new board
-    def make_new_board(self):
+    # Pass a seed to get the same board every time (e.g. for benchmarks or to reproduce a bug), and pass a (row, col)
+    # safe_spot to make sure that spot and the spots around it don't have bombs so the first dig there is always safe.
+    def make_new_board(self, seed=None, safe_spot=None):
         # Construct a new board based on the dim size & num bombs.
-        # We should construct a list of lists here (or whatever representation you prefer, but since we have a 2D
-        # board, list of lists is more natural).
-
-        # Each element in the innermost list (so, each 'spot') is a 3-element dictionary where 'is bomb' tracks whether
-        # the spot is a bomb, 'surrounding bombs' holds the number of surrounding bombs (if spot isn't a bomb), and
-        # 'flagged' tracks whether the spot has been flagged or not.
-        board = [[{'is bomb': False, 'surrounding bombs': None,
-                   'flagged': False} for i in range(self.dim_size)] for j in range(self.dim_size)]
-
-        # Plant bombs
-        bombs_planted = 0
-        while bombs_planted < self.num_bombs:
-            spot = random.randint(0, self.dim_size ** 2 - 1)
-            row = spot // self.dim_size
-            col = spot % self.dim_size
-
-            if board[row][col]['is bomb']:
-                continue
-            board[row][col]['is bomb'] = True
-            bombs_planted += 1
-
-        # Assign the created board to self.board
-        self.board = board
+        # The board is one flat bytearray with a byte per spot (see the COUNT_MASK & BOMB bits at the top of the file)
+        # rather than a list of lists of dicts, which took hundreds of bytes per spot and didn't fit big boards in RAM.
+        cells = bytearray(self.dim_size ** 2)
+        # Square boards work their neighbours out on the fly, and other topologies share a table between boards
+        self.neighbours = neighbour_table(self.dim_size, self.topology)
+
+        # If no seed was given, pick one at random so that every board can still be rebuilt from its seed later on
+        if seed is None:
+            seed = random.randrange(2 ** 63)
+        self.seed = seed
+        self.safe_spot = safe_spot
+
+        # Keep the safe spot and its surrounding spots free of bombs. If there are too many bombs to fit around that
+        # zone, just keep the safe spot itself free.
+        excluded = []
+        if safe_spot is not None:
+            excluded = sorted([self.index(*safe_spot)]
+                              + [self.index(r, c) for r, c in self.surrounding_spots(*safe_spot)])
+            if len(cells) - len(excluded) < self.num_bombs:
+                excluded = [self.index(*safe_spot)]
+
+        # Plant bombs. In no-guess mode the bombs come from a search for a board that can be solved from the safe spot.
+        if self.no_guess and safe_spot is not None:
+            from noguess import no_guess_bomb_spots
+            bomb_spots = no_guess_bomb_spots(self.dim_size, self.num_bombs, self.topology, seed, safe_spot,
+                                             self.no_guess_workers)
+        else:
+            bomb_spots = self.pick_bomb_spots(random.Random(seed), excluded)
+        for spot in bomb_spots:
+            cells[spot] = BOMB
+
+        # Assign the created board to self.cells and start the game with nothing dug or flagged
+        self.cells = cells
+        self.dug = Bitset(len(cells))
+        self.flags = Bitset(len(cells))
+        self.num_dug = 0
+        self.num_flags = 0
+        self.safe_spots_left = len(cells) - self.num_bombs
+        self.exploded = False
+        self.dug_changes += 1
+        self.revealing_all = False
+        self.cursor = safe_spot or (self.dim_size // 2, self.dim_size // 2)
+        self.view = None
+        self.follow_cursor = True
         # Now assign values to each spot on the board
         self.assign_values_to_board()
+        if self.move_log is not None:
+            self.move_log.new_game(self)
+        if self.history is not None:
+            self.history.clear()
+
+    # Helper for make_new_board that picks num_bombs different spots for the bombs, skipping any excluded spots.
+    # Picking random spots until we find enough empty ones gets really slow as the board fills up with bombs, so
+    # instead this does a partial Fisher-Yates shuffle: the k-th pick swaps a random not-yet-picked spot into
+    # position k.
+    # Only the swapped positions are stored (in a dict), so it takes one random number per bomb no matter how dense
+    # the board is, and never needs a list of every spot on the board.
+    def pick_bomb_spots(self, rng, excluded=()):
+        num_candidates = self.dim_size ** 2 - len(excluded)
+        if self.num_bombs > num_candidates:
+            raise ValueError(f"Can't fit {self.num_bombs} bombs on a board with {num_candidates} open spots.")
+
+        swapped = {}
+        picked = []
+        for k in range(self.num_bombs):
+            j = rng.randrange(k, num_candidates)
+            spot = swapped.get(j, j)
+            swapped[j] = swapped.get(k, k)
+
+            # Turn the candidate number into an actual spot by stepping over the (sorted) excluded spots
+            for excluded_spot in excluded:
+                if excluded_spot > spot:
+                    break
+                spot += 1
+            picked.append(spot)
 
-    # Helper for make_new_board to assign values to each spot (values 0-8 for bombs, nothing if spot['is_bomb'] == True)
-    def assign_values_to_board(self):
+        return picked
 
-        # Go through each spot on the board
-        for r in range(self.dim_size):
-            for c in range(self.dim_size):
+    # Helper for make_new_board to assign values to each spot (values 0-8 for the number of surrounding bombs).
+    # Bombs get a count too (it's just never shown) so that add_bomb()/remove_bomb() can keep every count up to date.
+    def assign_values_to_board(self):
+        bombs = self.cells.translate(BOMB_TABLE)  # 1 where there's a bomb, 0 everywhere else
+        counts = self.count_square(bombs) if self.topology == 'square' else self.count_from_bombs(bombs)
+
+        # Finally, store the counts in the low bits of each spot's byte
+        self.cells = bytearray(map(or_, self.cells.translate(CLEAR_COUNT_TABLE), counts))
+        self.clear_render_cache()
+
+    # Rather than counting the bombs around each spot one at a time, this counts every spot at once by adding up
+    # shifted copies of the board's bomb mask: first each spot's left/self/right neighbours along its row, then those
+    # row sums from the rows above and below. map() over bytes does the adding in C, so it stays fast on huge boards.
+    def count_square(self, bombs):
+        dim = self.dim_size
+
+        # Sum of the bombs to the left of, on, and to the right of each spot, padding each row with a 0 on either end
+        row_sums = []
+        for r in range(dim):
+            row = b'\x00' + bombs[r * dim:(r + 1) * dim] + b'\x00'
+            row_sums.append(bytes(map(add, map(add, row, row[1:]), row[2:])))
+
+        # Add the row sums from the row above and below, then take away the spot itself so it isn't counted
+        no_row = bytes(dim)
+        counts = bytearray()
+        for r in range(dim):
+            above = row_sums[r - 1] if r > 0 else no_row
+            below = row_sums[r + 1] if r < dim - 1 else no_row
+            counts += bytes(map(sub, map(add, map(add, above, row_sums[r]), below), bombs[r * dim:(r + 1) * dim]))
+        return counts
+
+    # The shifted sums only work when every row lines up with the next, so other topologies go the other way round and
+    # add 1 to every neighbour of each bomb, reading the neighbours out of the neighbour table
+    def count_from_bombs(self, bombs):
+        offsets, indices = self.neighbours.offsets, self.neighbours.indices
+        counts = bytearray(len(bombs))
+        for bomb in compress(range(len(bombs)), bombs):
+            for i in indices[offsets[bomb]:offsets[bomb + 1]]:
+                counts[i] += 1
+        return counts
+
+    # Helper that lists the (row, col) of each of the spots surrounding a specific spot (up to 8 on a square board)
+    def surrounding_spots(self, row, col):
+        return [divmod(i, self.dim_size) for i in self.neighbours[row * self.dim_size + col]]
+
+    # These functions add, remove or move a single bomb and just patch up the counts of the spots around it, so a
+    # board can be regenerated or repaired without recounting the whole thing with assign_values_to_board()
+    def add_bomb(self, row, col):
+        if self.is_bomb(row, col):
+            return False
+        self.cells[self.index(row, col)] |= BOMB
+        if self.dug is not None and self.index(row, col) not in self.dug:
+            self.safe_spots_left -= 1
+        surrounding = self.neighbours[self.index(row, col)]
+        for i in surrounding:
+            self.cells[i] += 1
+        self.mark_rows_changed({row} | {i // self.dim_size for i in surrounding})
+        self.num_bombs += 1
+        return True
 
-                # If spot contains a bomb, don't waste time assigning it a 'surrounding bombs' value
-                if self.board[r][c]['is bomb']:
-                    continue
+    def remove_bomb(self, row, col):
+        if not self.is_bomb(row, col):
+            return False
+        self.cells[self.index(row, col)] &= ~BOMB
+        if self.dug is not None and self.index(row, col) not in self.dug:
+            self.safe_spots_left += 1
+        surrounding = self.neighbours[self.index(row, col)]
+        for i in surrounding:
+            self.cells[i] -= 1
+        self.mark_rows_changed({row} | {i // self.dim_size for i in surrounding})
+        self.num_bombs -= 1
+        return True
 
-                # Otherwise, assign the value of the num of surrounding bombs
-                self.board[r][c]['surrounding bombs'] = self.get_num_surrounding_bombs(r, c)
+    def move_bomb(self, from_row, from_col, to_row, to_col):
+        if not self.is_bomb(from_row, from_col) or self.is_bomb(to_row, to_col):
+            return False
+        self.remove_bomb(from_row, from_col)
+        self.add_bomb(to_row, to_col)
+        return True
 
-    # Helper for assign_value_to_board that counts the number of bombs surrounding a specific spot
+    # Counts the number of bombs surrounding a specific spot by looking at each of its neighbours
     def get_num_surrounding_bombs(self, row, col):
         # Initialize counter for number of bombs
         bomb_count = 0
 
-        # For each of the 8 squares around that spot, if there's a bomb, increment counter by +1.
-        # We don't want the range to go below 0 or above dim size (since range will go up to dim size - 1).
-        for surrounding_row in range(max(0, row - 1), min(self.dim_size, (row + 1) + 1)):
-            for surrounding_col in range(max(0, col - 1), min(self.dim_size, (col + 1) + 1)):
-
-                # We don't want to count the spot itself--just its surrounding spots
-                if surrounding_row == row and surrounding_col == col:
-                    continue
-                if self.board[surrounding_row][surrounding_col]['is bomb']:
-                    bomb_count += 1
+        # For each of the squares around that spot, if there's a bomb, increment counter by +1.
+        # self.neighbours already leaves out the spot itself and anything off the edge of the board.
+        for i in self.neighbours[self.index(row, col)]:
+            if self.cells[i] & BOMB:
+                bomb_count += 1
 
         return bomb_count
 
-    def dig_spot(self, row, col):
-        # First, let's add this spot to our set of dug places as a tuple
-        self.dug.add((row, col))
+    # Helpers to look up a spot's byte in Board.cells (or its bit in Board.dug/Board.flags) and read the bits out of it
+    def index(self, row, col):
+        return row * self.dim_size + col
+
+    def is_bomb(self, row, col):
+        return bool(self.cells[row * self.dim_size + col] & BOMB)
+
+    def is_flagged(self, row, col):
+        return row * self.dim_size + col in self.flags
+
+    def is_dug(self, row, col):
+        return row * self.dim_size + col in self.dug
 
-        # Then we have 3 scenarios:
+    def surrounding_bombs(self, row, col):
+        return self.cells[row * self.dim_size + col] & COUNT_MASK
+
+    def dig_spot(self, row, col):
+        # Dig the spot (and everything around it that needs digging), then we have 3 scenarios:
         # 1) There's a bomb where we dig => return False
-        if self.board[row][col]['is bomb']:
-            return False
-        # 2) We dig a spot that's next to a bomb => we stop digging
-        elif self.board[row][col]['surrounding bombs'] > 0:
-            return True
-
-        # 3) We dig a spot that's not next to a bomb and must keep digging.
-        # To decide how to keep digging, we'll use the same pattern we used for checking for bombs;
-        # however, we'll use recursion to dig up a bunch of spots since we're doing the same thing over and over
-        for surrounding_row in range(max(0, row-1), min(self.dim_size, (row+1)+1)):
-            for surrounding_col in range(max(0, col-1), min(self.dim_size, (col+1)+1)):
-                if (surrounding_row, surrounding_col) in self.dug:  # If we hit a spot we've already dug, jump over it
+        # 2) We dig a spot that's next to a bomb => we stop digging and return True
+        # 3) We dig a spot that's not next to a bomb => dig_region() keeps digging outwards, and we return True
+        self.dig_region(row, col)
+        return not self.is_bomb(row, col)
+
+    # Digs a spot and, if it has no surrounding bombs, keeps digging outwards until every connected spot with no
+    # surrounding bombs (plus the numbered spots on the edge of that region) has been dug. This used to be done with
+    # recursion, but one dig on a big, sparse board can open hundreds of thousands of spots and blow past Python's
+    # recursion limit, so instead we keep a list of spots still to dig around. Each spot is marked dug as soon as it's
+    # added to the list, so no spot is ever visited twice and the work is linear in the size of the region.
+    # Returns the set of (row, col) spots that were newly dug by this call.
+    def dig_region(self, row, col):
+        cells = self.cells
+        dug = self.dug.bits  # Reading/setting the dug bits directly is noticeably faster than going through Bitset
+        neighbours = self.neighbours
+        square = self.topology == 'square'
+        dim = self.dim_size
+        start = row * dim + col
+        self.cursor, self.follow_cursor = (row, col), True
+        if self.move_log is not None:
+            self.move_log.dig(start)
+        if dug[start >> 3] >> (start & 7) & 1:  # Nothing new to dig
+            return set()
+
+        dug[start >> 3] |= 1 << (start & 7)
+        newly_dug = [start]
+
+        # Only keep digging if we didn't hit a bomb and the spot has no surrounding bombs
+        to_dig_around = [] if cells[start] & (BOMB | COUNT_MASK) else [start]
+        while to_dig_around:
+            spot = to_dig_around.pop()
+            if square and 0 < spot // dim < dim - 1 and 0 < spot % dim < dim - 1:
+                # Spots away from the edge always have all 8 neighbours, so skip the lookup
+                surrounding = (spot - dim - 1, spot - dim, spot - dim + 1, spot - 1,
+                               spot + 1, spot + dim - 1, spot + dim, spot + dim + 1)
+            else:
+                surrounding = neighbours[spot]
+            for i in surrounding:
+                if dug[i >> 3] >> (i & 7) & 1:  # If we hit a spot we've already dug, jump over it
                     continue
-                else:
-                    self.dig_spot(surrounding_row, surrounding_col)
-
-        # At some point, the dig will finish out the for loops, and so we'll want to return True when that's all done
-        return True
+                dug[i >> 3] |= 1 << (i & 7)
+                newly_dug.append(i)
+                # A spot next to a 0 can't be a bomb, so we only need to check whether it's a 0 too
+                if not cells[i] & COUNT_MASK:
+                    to_dig_around.append(i)
+
+        # Keep the counters up to date. Only the first spot can be a bomb, since we never dig around a numbered spot.
+        self.num_dug += len(newly_dug)
+        self.dug_changes += 1
+        if cells[start] & BOMB:
+            self.exploded = True
+            self.safe_spots_left -= len(newly_dug) - 1
+        else:
+            self.safe_spots_left -= len(newly_dug)
+        if self.history is not None:
+            self.history.record_dig(newly_dug)
+        newly_dug = {divmod(i, dim) for i in newly_dug}
+        self.mark_rows_changed({r for r, _ in newly_dug})
+        return newly_dug
 
     def flag_spot(self, row, col):
-        self.board[row][col]['flagged'] = True
+        i = self.index(row, col)
+        self.cursor, self.follow_cursor = (row, col), True
+        if self.move_log is not None:
+            self.move_log.flag(i)
+        if i not in self.flags:
+            self.flags.add(i)
+            self.num_flags += 1
+            self.mark_rows_changed([row])
+            if self.history is not None:
+                self.history.record_flag(i)
         return True
 
+    # Un-digs every spot (leaving the bombs & flags where they are) so the same board can be played through again from
+    # the start, e.g. by the no-guess search or the benchmarks
+    def clear_dug(self):
+        self.dug = Bitset(len(self.cells))
+        self.num_dug = 0
+        self.safe_spots_left = len(self.cells) - self.num_bombs
+        self.exploded = False
+        self.dug_changes += 1
+        if self.history is not None:
+            self.history.clear()
+        self.clear_render_cache()
+
+    # Undo & redo the last dig or flag (see history.py). Each returns the (row, col) of the move that was undone or
+    # redone, or None if there wasn't one (or the history isn't on).
+    def undo(self):
+        return self.history.undo(self) if self.history is not None else None
+
+    def redo(self):
+        return self.history.redo(self) if self.history is not None else None
+
+    # Takes a snapshot of which spots are dug & flagged, to roll back to later with restore(). This is cheap (it's a
+    # position in the history, which it turns on if it isn't already), and rolling back only touches the spots that
+    # changed since, so search code can try moves out on the real board instead of copying it.
+    # A move log can't record moves being rolled back, so neither works on a board that's being logged.
+    def snapshot(self):
+        self.check_not_logged()
+        if self.history is None:
+            from history import History
+            self.history = History()
+        return self.history.snapshot()
+
+    def restore(self, token):
+        self.check_not_logged()
+        self.history.restore(self, token)
+
+    def check_not_logged(self):
+        if self.move_log is not None:
+            raise ValueError("Moves can't be rolled back while they're being logged.")
+
+    # The game is won once every spot that isn't a bomb has been dug, and lost as soon as a bomb is dug
+    def game_won(self):
+        return self.safe_spots_left == 0 and not self.exploded
+
+    def game_lost(self):
+        return self.exploded
+
+    # Show every spot on the board as if it had been dug so the end-of-game board shows where all the bombs were. This
+    # doesn't touch Board.dug at all; the board just gets printed differently until the next board is made.
+    def reveal_board(self):
+        self.revealing_all = True
+        self.clear_render_cache()
+
     def __str__(self):
         # Let's make the board that we want the player to see!
-        first_row = "   |"  # We're going to make a string of column numbers along the first row
-        horizontal_line = "————"  # Make a string of dashes to underline the title column
-
-        for c in range(self.dim_size):
-            # Concat each column number + "|" divider onto the first_row string. Note that numbers may have dif lengths
-            if len(str(c)) == 1:  # Center-align col numbers that are of length 1
-                first_row += " " + str(c) + " |"
-            elif len(str(c)) == 2:  # Left-align col numbers that are of length 2
-                first_row += str(c) + " |"
-            elif len(str(c)) == 3:
-                first_row += str(c) + "|"
-
-            # For each additional column, we also want to extend the horizontal line
-            horizontal_line += "————"
-
-        # Initialize the list that'll hold all of the strings that represent each row of the board
-        board_values = [first_row, horizontal_line]
-        # Now create a list of strings of row values for each row
-        for r in range(self.dim_size):
-            # Initialize string var that will hold all the values from each row in one string
-            row_values = ""
-
-            # Start each row with the row number.
-            # Again, be mindful that '3' and '124' would take up diff amounts of space
-            if len(str(r)) == 1:  # Center-align row numbers that are of length 1
-                row_values = str(r) + "  |"
-            elif len(str(r)) == 2:  # Left-align row numbers that are of length 2
-                row_values = str(r) + " |"
-            elif len(str(r)) == 3:
-                row_values = str(r) + "|"
-
-            # Now add the values of each spot in that row onto the row_values string
-            for c in range(self.dim_size):
-
-                # If the spot hasn't been dug yet, we don't want its value showing
-                if (r, c) not in self.dug:
-                    # If the spot has been flagged, we want to show the flag symbol
-                    if self.board[r][c]['flagged']:
-                        row_values += self.symbols['flag'] + "|"
-                    else:
-                        row_values += self.symbols['undug spot'] + "|"
-
-                # elif the spot was dug and it's a bomb, show the bomb symbol
-                elif self.board[r][c]['is bomb']:
-                    row_values += self.symbols['bomb'] + "|"
-
-                # elif the spot was dug and it's a 0, show the 'no surrounding bombs' symbol
-                elif self.board[r][c]['surrounding bombs'] == 0:
-                    row_values += self.symbols['no surrounding bombs'] + "|"
-
-                # otherwise, the spot was dug and it's not a bomb or a 0 (it has a non-zero 'surrounding bombs' value)
-                else:
-                    row_values += " " + str(self.board[r][c]['surrounding bombs']) + " |"
-
-            # Add that string of row values to the list of board values
-            board_values += [row_values]
-
-        # Put a horizontal line at the very bottom of the board for aesthetics
-        board_values += [horizontal_line]
-
-        # Since this function needs to return a string, we'll have to concatenate all of the row_values in the list
-        # into one single string, using \n to break the lines
-        string_board = "\n"
-        for row in board_values:
-            string_board += row + "\n"
-
-        return string_board
+        # If the whole board won't fit on the screen, printing all of it would just scroll most of it out of sight (a
+        # 1000x1000 board is about 4 MB of text), so only print the part of it that fits (see render_viewport())
+        if not self.fits_on_screen():
+            height, width = self.viewport_size()
+            return self.render_viewport(*self.view_origin(height, width), height, width)
+        return self.render_board()
+
+    # Makes the string for the whole board.
+    # Rebuilding every row on every turn gets slow on big boards, so the header and each row's string are cached,
+    # and only the rows that changed since the last time the board was printed get rebuilt (see mark_rows_changed())
+    def render_board(self):
+        if self.rendered_header is None or self.rendered_header[0] != self.dim_size:
+            self.rendered_header = (self.dim_size,) + self.render_header()
+        if self.rendered_rows is None or len(self.rendered_rows) != self.dim_size:
+            self.rendered_rows = [self.render_row(r) for r in range(self.dim_size)]
+        else:
+            for r in self.rows_to_render:
+                self.rendered_rows[r] = self.render_row(r)
+        self.rows_to_render = set()
+
+        _, first_row, horizontal_line = self.rendered_header
+
+        # Put a horizontal line under the column numbers and at the very bottom of the board for aesthetics, and join
+        # everything into one single string, using \n to break the lines
+        return "\n".join(["", first_row, horizontal_line, *self.rendered_rows, horizontal_line, ""])
+
+    # Helper for render_board that makes the string of column numbers along the first row, plus the horizontal line
+    # that underlines it
+    def render_header(self):
+        first_row = " " * self.label_width(self.dim_size - 1) + "|" + self.render_column_numbers(0, self.dim_size)
+        # For each column, we also want to extend the horizontal line
+        horizontal_line = "—" * len(first_row)
+        return first_row, horizontal_line
+
+    # Column numbers get 3 characters each, the same as a spot's symbol. Numbers of length 1 are center-aligned and
+    # numbers of length 2 are left-aligned, and numbers with more than 3 digits only show their last 3 digits (the
+    # viewport says which columns it's showing, so there's no mixing up column 12 with column 1012).
+    def render_column_numbers(self, left, width):
+        return "".join(f"{str(c)[-3:]:^3}|" for c in range(left, left + width))
+
+    # Row numbers are left-aligned and padded to the width of the longest row number that's being printed (at least 3,
+    # which is what every board up to 1000x1000 needs)
+    def label_width(self, *rows):
+        return max(3, *(len(str(r)) for r in rows))
+
+    def render_row_number(self, r, label_width):
+        row_number = f"{r:<{label_width}}|"
+        # Hex boards shift every other row over by half a spot so the rows interlock the way their neighbours do
+        if self.topology == 'hex' and r % 2:
+            row_number += "  "
+        return row_number
+
+    # Helper for render_board that makes the string for a single row of the board
+    def render_row(self, r):
+        # Start each row with the row number, then look up the string for each spot by its byte value and join them
+        # all together
+        if self.spot_strings is None:
+            self.spot_strings = [self.render_spot(cell) for cell in range(DUG << 1)]
+        row_number = self.render_row_number(r, self.label_width(self.dim_size - 1))
+        return row_number + "".join(map(self.spot_strings.__getitem__, self.row_cells(r, 0, self.dim_size)))
+
+    # Returns the bytes of `width` spots of row r starting from column `left`, with the spots' dug & flagged bits
+    # added in (or with every spot marked dug if the whole board is being revealed)
+    def row_cells(self, r, left, width):
+        start = r * self.dim_size + left
+        row_cells = bytes(map(or_, self.cells[start:start + width], self.flags.spread(start, width, FLAGGED)))
+        if self.revealing_all:
+            return row_cells.translate(REVEAL_TABLE)
+        return bytes(map(or_, row_cells, self.dug.spread(start, width, DUG)))
+
+    # --- Viewport
+    # How many rows & columns of spots fit on the screen, leaving room for the row numbers, the header lines and the
+    # prompt underneath
+    def viewport_size(self):
+        terminal = shutil.get_terminal_size()
+        return max(1, terminal.lines - 8), max(1, (terminal.columns - 8) // 4)
+
+    def fits_on_screen(self):
+        height, width = self.viewport_size()
+        return self.dim_size <= height and self.dim_size <= width
+
+    # Returns the (top row, left col) of the part of the board to print. While the view is following the cursor, it
+    # only moves (to centre on the cursor) once the cursor has gone off screen, so it doesn't jump around on every dig.
+    def view_origin(self, height, width):
+        row, col = self.cursor
+        if self.view is None or (self.follow_cursor and not (self.view[0] <= row < self.view[0] + height
+                                                             and self.view[1] <= col < self.view[1] + width)):
+            self.view = (row - height // 2, col - width // 2)
+        top, left = self.view
+        if self.dim_size is not None:  # Don't scroll past the edges of the board
+            top = max(0, min(top, self.dim_size - height))
+            left = max(0, min(left, self.dim_size - width))
+        self.view = (top, left)
+        return self.view
+
+    # Moves the view by a number of rows & columns (negative is up/left)
+    def pan(self, rows, cols):
+        height, width = self.viewport_size()
+        top, left = self.view_origin(height, width)
+        self.view = (top + rows, left + cols)
+        self.follow_cursor = False
+        self.view_origin(height, width)
+
+    # Centres the view on a spot
+    def jump_to(self, row, col):
+        height, width = self.viewport_size()
+        self.view = (row - height // 2, col - width // 2)
+        self.follow_cursor = False
+        self.view_origin(height, width)
+
+    # Makes the string for `height` rows and `width` columns of the board, starting from row `top` and column `left`.
+    # This only ever looks at the spots inside the window, so it takes the same time on any size of board.
+    def render_viewport(self, top, left, height, width):
+        if self.dim_size is not None:
+            height, width = min(height, self.dim_size - top), min(width, self.dim_size - left)
+        if self.spot_strings is None:
+            self.spot_strings = [self.render_spot(cell) for cell in range(DUG << 1)]
+
+        label_width = self.label_width(top, top + height - 1)
+        first_row = " " * label_width + "|" + self.render_column_numbers(left, width)
+        horizontal_line = "—" * len(first_row)
+        lines = ["", f"Rows {top}-{top + height - 1}, columns {left}-{left + width - 1}", first_row, horizontal_line]
+        for r in range(top, top + height):
+            lines.append(self.render_row_number(r, label_width)
+                         + "".join(map(self.spot_strings.__getitem__, self.row_cells(r, left, width))))
+        lines += [horizontal_line, ""]
+        return "\n".join(lines)
+
+    # Helper for render_row that works out what a spot should look like (symbol + "|" divider) from its byte value.
+    # There are only 128 possible values, so render_row works these out once and then just looks them up.
+    def render_spot(self, cell):
+        # If the spot hasn't been dug yet, we don't want its value showing
+        if not cell & DUG:
+            # If the spot has been flagged, we want to show the flag symbol
+            if cell & FLAGGED:
+                return self.symbols['flag'] + "|"
+            return self.symbols['undug spot'] + "|"
+
+        # elif the spot was dug and it's a bomb, show the bomb symbol
+        elif cell & BOMB:
+            return self.symbols['bomb'] + "|"
+
+        # elif the spot was dug and it's a 0, show the 'no surrounding bombs' symbol
+        elif cell & COUNT_MASK == 0:
+            return self.symbols['no surrounding bombs'] + "|"
+
+        # otherwise, the spot was dug and it's not a bomb or a 0 (it has a non-zero 'surrounding bombs' value)
+        return " " + str(cell & COUNT_MASK) + " |"
+
+    # Let __str__ know which rows have changed since the board was last printed so it only rebuilds those rows
+    def mark_rows_changed(self, rows):
+        self.rows_to_render.update(rows)
+
+    # Throw away all of the cached row strings (e.g. when there's a new board or a symbol changes)
+    def clear_render_cache(self):
+        self.rendered_rows = None
+        self.rows_to_render = set()
 
     # --- Change Settings
     def general_settings(self):
@@ -258,7 +747,7 @@ class Board:
               f"\n  3. Exit settings menu")
         # Check input is valid
         while True:
-            user_input = input("> ").lower().strip()
+            user_input = ask("> ").lower().strip()
 
             # If user wants to change dimensions/bombs, just restart the game
             if user_input in ["1", "board", "dimension", "dimensions", "dim", "board dimensions", "board dim",
@@ -276,14 +765,14 @@ class Board:
             elif user_input in quit_responses:
                 quit_game()
             else:
-                print('Please enter a valid choice, such as "3" or "Symbols".')
+                tell('Please enter a valid choice, such as "3" or "Symbols".')
 
         # Unless the user is restarting the game, print the board after settings have been adjust/after they exit so
         # that when the game loops back to asking where they want to play/if they want to dig or flag, they can easily
         # reference the board
         if not self.restart_game:
-            sleep(0.5)
-            print(self)
+            pause(0.5)
+            show_board(self)
 
     # This function gets user's input on what symbol they want to change and what they want the new symbol to be,
     # and it checks that the input is valid and that the 'new symbol' is not already in use
@@ -302,7 +791,7 @@ class Board:
 
         # Check option selection input is valid & assign symbol_name
         while True:
-            user_input = input('> ').lower().strip()
+            user_input = ask('> ').lower().strip()
 
             # Let user input the actual symbol to identify the symbol name, as long as
             # self.symbols[symbol].lower().strip() != '', b/c the function would accept the user accidentally pressing
@@ -330,7 +819,7 @@ class Board:
             elif user_input in quit_responses:
                 quit_game()
             else:
-                print('Please enter a valid choice, such as "1" or "Flag".')
+                tell('Please enter a valid choice, such as "1" or "Flag".')
 
         # If user hasn't exited settings, ask for their new symbol
         if not exit_settings:
@@ -339,7 +828,7 @@ class Board:
 
             # Check new symbol input is valid
             while True:
-                new_symbol = input("> ")  # Don't want to lower().strip() input bc user might want to use spaces
+                new_symbol = ask("> ")  # Don't want to lower().strip() input bc user might want to use spaces
 
                 if new_symbol.lower().strip() in ['exit', 'exit menu', 'exit settings', 'exit settings menu']:
                     break
@@ -353,79 +842,274 @@ class Board:
                 elif len(new_symbol) == 3:
                     pass
                 else:
-                    print(f'Please enter a new symbol to use for the {symbol_name} that is 1-3 characters long. For '
-                          f'example, "F" or "~~~".')
+                    tell(f'Please enter a new symbol to use for the {symbol_name} that is 1-3 characters long. For '
+                         f'example, "F" or "~~~".')
                     continue
 
                 # Check that the new symbol is not already in use
                 if new_symbol in self.symbols.values():
-                    print('That symbol is already in use. Please enter a different symbol or enter "Exit" to exit '
-                          'the settings menu.')
+                    tell('That symbol is already in use. Please enter a different symbol or enter "Exit" to exit '
+                         'the settings menu.')
                     continue
                 else:
                     self.change_symbol(symbol_name, new_symbol)
-                    print(f'\nThe {symbol_name} symbol has been changed to: "{new_symbol}"')
+                    tell(f'\nThe {symbol_name} symbol has been changed to: "{new_symbol}"')
                     break
 
     # This function actually changes the symbol
     def change_symbol(self, symbol_name, new_symbol):
         self.symbols[symbol_name] = new_symbol
+        # Every row might be showing the old symbol, so the cached rows need rebuilding
+        self.spot_strings = None
+        self.clear_render_cache()
 
     # Call this function at end of each game to reset board values so they can be created anew when the next game starts
     def reset_board(self):
         self.restart_game = False
-        self.board = None
-        self.dug = set()
+        self.cells = None
+        self.dug = None
+        self.flags = None
+        self.num_dug = 0
+        self.num_flags = 0
+        self.safe_spots_left = 0
+        self.exploded = False
+        self.revealing_all = False
+        self.seed = None
+        self.safe_spot = None
+        self.cursor = (0, 0)
+        self.view = None
+        self.follow_cursor = True
+        self.clear_render_cache()
+
+
+# Helper for play() that makes the solver used for hints and for finishing the game automatically. When the solver
+# has to guess, it picks the spot that's least likely to be a bomb.
+def make_solver(game_board):
+    from probability import ProbabilityEngine, safest_guess
+    from solver import Solver
+
+    solver = Solver(game_board, guesser=safest_guess)
+    solver.probability_engine = ProbabilityEngine(solver)
+    return solver
+
+
+# Helper for play() that handles the commands for looking around a board that's too big to fit on the screen:
+# 'up', 'down', 'left' or 'right' (followed by how many spots to move, or half a screen if there's no number) and
+# 'jump col, row' to centre the screen on a spot. Returns True if the input was one of these commands.
+def move_view(game_board, user_input):
+    pan = re.fullmatch('(up|down|left|right)\\s*(\\d*)', user_input)
+    jump = re.fullmatch('(?:jump|go to|goto)(?:\\s+to)?\\s*(\\d+)\\s*,\\s*(\\d+)', user_input)
+    if pan:
+        direction, distance = pan.groups()
+        height, width = game_board.viewport_size()
+        if direction in ('up', 'down'):
+            rows = int(distance) if distance else max(1, height // 2)
+            game_board.pan(-rows if direction == 'up' else rows, 0)
+        else:
+            cols = int(distance) if distance else max(1, width // 2)
+            game_board.pan(0, -cols if direction == 'left' else cols)
+    elif jump:
+        col, row = int(jump.group(1)), int(jump.group(2))
+        if row >= game_board.dim_size or col >= game_board.dim_size:
+            raise ValueError
+        game_board.jump_to(row, col)
+    else:
+        return False
+    show_board(game_board)
+    return True
+
+
+# Helper for play() that saves the game to a file and switches the board over to that file, so every move after that
+# is written to it as it's made (see savefile.py). Returns the BoardFile the game is being saved to.
+def save_game(game_board, saved_game):
+    from savefile import save_and_open
+
+    if saved_game is not None:
+        saved_game.flush()
+        tell(f"Saved! This game is already being saved to '{saved_game.path}' as you play.")
+        return saved_game
+
+    path = ask("What file would you like to save the game to? (Press enter for 'minesweeper.save')\n> ").strip()
+    path = path or 'minesweeper.save'
+    try:
+        saved_game = save_and_open(game_board, path)
+    except (OSError, ValueError) as error:
+        tell(f"Couldn't save the game: {error}")
+        return None
+    tell(f"Saved! Every move from now on is saved as you go. Run 'python main.py {path}' to pick this game back up.")
+    return saved_game
+
+
+# Helper for play() that undoes (or redoes) the last move and shows the board
+def undo_move(game_board, undo):
+    if game_board.history is None:
+        tell("Moves can't be undone while they're being logged.")
+        return
+    spot = game_board.undo() if undo else game_board.redo()
+    if spot is None:
+        tell(f"There's nothing to {'undo' if undo else 'redo'}.")
+        return
+    show_board(game_board)
+    tell(f"{'Undid' if undo else 'Redid'} the move at ({spot[1]}, {spot[0]}).")
+
+
+# Helper for play() that handles 'stats' (show the timing & memory figures collected so far, see instrument.py),
+# 'stats on', 'stats off' and 'stats reset'. Returns True if the input was one of these commands.
+def stats_command(user_input):
+    command = re.fullmatch('stats(?:\\s+(on|off|reset))?', user_input)
+    if command is None:
+        return False
+
+    import instrument
+    action = command.group(1)
+    if action == 'on':
+        # Wrap this module's Board & helpers, since that's where play() is running (it's __main__ when run as a script)
+        instrument.enable(sys.modules[__name__])
+        tell("Stats are on. Input 'stats' any time to see them.")
+    elif action == 'off':
+        instrument.disable()
+        tell("Stats are off.")
+    elif action == 'reset':
+        instrument.reset()
+        tell("Stats have been reset.")
+    elif not instrument.enabled() and not instrument.stats['calls']['make_new_board']['calls']:
+        tell("Stats are off. Input 'stats on' to start collecting them, or start the game with --stats.")
+    else:
+        tell(instrument.report())
+    return True
+
+
+# Helper for play() that reads a spot typed in col, row form and returns it as (row, col). Raises ValueError if the
+# input isn't a spot on the board.
+def parse_spot(user_input, dim_size):
+    # If user only inputs something like "1" or "1,", or if they don't put the comma, raise error
+    if len(user_input) < 3 or "," not in user_input:
+        raise ValueError
+
+    # Split the input into two values to be assigned to col & row.
+    # sometimes re.split has fluff in middle, so ensure you're taking the last value by using [-1].
+    user_input = re.split(',(\\s)*', user_input)
+    col, row = int(user_input[0]), int(user_input[-1])
+
+    # Throw up an error if the input is out of dimension range
+    if row < 0 or row >= dim_size or col < 0 or col >= dim_size:
+        raise ValueError
+    return row, col
+
+
+# Helper for play() that reads moves typed out in full: one or more of 'd col, row' or 'f col, row' (or 'dig'/'flag'),
+# split by ';'. Returns a list of ('dig' or 'flag', row, col), or None if the input isn't moves. Raises ValueError if a
+# move is off the board.
+def parse_moves(user_input, dim_size):
+    moves = []
+    for part in user_input.split(';'):
+        move = re.fullmatch('(d|dig|f|flag)\\s+(\\d+)\\s*,\\s*(\\d+)', part.strip())
+        if move is None:
+            return None
+        col, row = int(move.group(2)), int(move.group(3))
+        if row >= dim_size or col >= dim_size:
+            raise ValueError
+        moves.append(('dig' if move.group(1) in ('d', 'dig') else 'flag', row, col))
+    return moves
+
+
+# Helper for play() that describes how the current game (and the games before it) are going, for 'status'
+def game_status(game_board, results):
+    state = 'lost' if game_board.game_lost() else 'won' if game_board.game_won() else 'playing'
+    return (f"{state}: {game_board.num_dug} dug, {game_board.num_flags} flagged, {game_board.safe_spots_left} safe "
+            f"spots left ({results['won']} won, {results['lost']} lost so far)")
 
 
 # play the game
-def play():
+# Pass the path of a save file to pick up the game saved in it (it keeps getting saved to that file as you play), and
+# the path of a move log to record every game to it (see movelog.py). Pass a seed to get the same games every time (the
+# nth new board is made from seed + n).
+def play(save_path=None, log_path=None, seed=None):
     # Initialize game_board
     game_board = Board()
 
+    # If there's a save file, load the saved game into game_board. The first game is the saved one instead of a new one.
+    saved_game = None
+    if save_path is not None:
+        from savefile import open_board
+        saved_game = open_board(save_path, game_board)
+    if log_path is not None:
+        from movelog import MoveLog
+        MoveLog(log_path).attach(game_board)
+    else:
+        # Keep track of the moves so they can be undone (a move log can't record undos, so there's no undo with one)
+        from history import History
+        game_board.history = History()
+
     print("\nWelcome to Minesweeper!"
           "\nInput 'quit' any time to quit the game.")
 
     # Create lists of responses that need to be used multiple times in this function
     settings_responses = ['settings', 'setting', 'set']
+    hint_responses = ['hint', 'h']
+    auto_responses = ['auto', 'auto play', 'autoplay', 'solve']
+    save_responses = ['save', 'save game']
+    undo_responses = ['undo', 'u']
+    redo_responses = ['redo', 'r']
+    board_responses = ['board', 'show', 'print']
+    status_responses = ['status', 'stat']
+
+    # How many games have been won & lost so far (for 'status')
+    results = {'won': 0, 'lost': 0}
+    boards_made = 0
 
     # This loop is so that if Board.restart_game = True, the game will restart/jump back to the very top
     while True:
-        # Set board dimensions & number of bombs
-        game_board.set_dim_size()
-        game_board.set_num_bombs()
+        # Set board dimensions & number of bombs (unless we're picking up a saved game, which already has them)
+        if saved_game is None:
+            game_board.set_dim_size()
+            game_board.set_num_bombs()
 
         # This loop makes each game go right into the next game with the same dimensions & no. of bombs
         while True:
 
-            sleep(0.5)
+            pause(0.5)
             print("\n\n**************************"
                   "\n  **********************"
                   "\n         NEW GAME         "
                   "\n  **********************"
                   "\n**************************\n")
-            sleep(0.5)
-
-            print("Input 'settings' any time to change the game settings.")
-            sleep(0.5)
-
-            # Create a new board for this game
-            game_board.make_new_board()
-
-            safe = True  # Used to indicate whether the player is safe after they've dug a spot
+            pause(0.5)
+
+            print("Input 'settings' any time to change the game settings, 'hint' for a hint, 'auto' to let the "
+                  "computer finish the game for you, 'undo' or 'redo' to take back a move, or 'save' to save the game.")
+            pause(0.5)
+
+            # Create a new board for this game (unless the saved game was just loaded into it)
+            if game_board.cells is None:
+                game_board.make_new_board(None if seed is None else seed + boards_made)
+                boards_made += 1
+            if not game_board.fits_on_screen():
+                print("This board is too big to fit on your screen, so only part of it is shown at a time. Input "
+                      "'up', 'down', 'left' or 'right' (plus a number to move that many spots) to look around, or "
+                      "'jump col, row' to jump to a spot.")
+                pause(0.5)
+
+            safe = not game_board.game_lost()  # Used to indicate whether the player is safe after they've dug a spot
             col, row = None, None
 
-            # as long as the number of spaces dug is less than the number of spaces available, keep playing this game
-            while len(game_board.dug) < game_board.dim_size**2 - game_board.num_bombs:
+            # The solver is only created if the player asks for a hint or for the computer to finish the game
+            solver = None
+
+            # as long as there are safe spots left to dig, keep playing this game
+            while game_board.safe_spots_left > 0 and safe:
                 # First, show user the current board
-                sleep(0.5)
-                print(game_board)
+                pause(0.5)
+                show_board(game_board)
+                # Set once a move's been made without asking dig or flag (by the solver or a line of moves)
+                moved = False
 
                 # Ask user where they want to dig and make sure the input is acceptable
                 while not game_board.restart_game:
                     # Don't need \n at the start of this message b/c the printed game board has an extra \n underneath
-                    user_input = input("Where would you like to dig/flag? Input as col, row:\n> ").lower().strip()
+                    user_input = ask("Where would you like to dig/flag? Input as col, row:\n> ").lower().strip()
                     try:
+                        moves = parse_moves(user_input, game_board.dim_size)
                         # If user asked to quit, quit
                         if user_input in quit_responses:
                             quit_game()
@@ -435,35 +1119,85 @@ def play():
                             # After adjusting settings, loop back to asking user where they want to play.
                             # If Board.restart_game was set to True during settings, the game will break out of loop
                             continue
-                        # Elif user only inputs something like "1" or "1,", or if they don't put the comma, raise error
-                        elif len(user_input) < 3 or "," not in user_input:
-                            raise ValueError
-
-                        # Split the input into two values to be assigned to col & row.
-                        # sometimes re.split has fluff in middle, so ensure you're taking the last value by using [-1].
-                        user_input = re.split(',(\\s)*', user_input)
-                        col, row = int(user_input[0]), int(user_input[-1])
-
-                        # Throw up an error if the input is out of dimension range
-                        if row < 0 or row >= game_board.dim_size or col < 0 or col >= game_board.dim_size:
-                            raise ValueError
+                        # Elif user wants to see (or turn on/off) the timing & memory stats, do that and ask again
+                        elif stats_command(user_input):
+                            continue
+                        # Elif user wants a hint, ask the solver for a move it's sure about
+                        elif user_input in hint_responses:
+                            if solver is None:
+                                solver = make_solver(game_board)
+                            hint = solver.hint()
+                            if hint is None and game_board.num_dug == 0:
+                                tell("Nothing's been dug yet, so anywhere is as good a place to start as any!")
+                            elif hint is None:
+                                # Nothing is definitely safe, so suggest the spot that's least likely to be a bomb
+                                guess, chance = solver.probability_engine.safest_guess()
+                                guess_row, guess_col = divmod(guess, game_board.dim_size)
+                                tell(f"There isn't a spot that's definitely safe right now, so you'll have to guess. "
+                                     f"Your safest bet is spot ({guess_col}, {guess_row}), which has a "
+                                     f"{chance:.0%} chance of being a bomb.")
+                            else:
+                                action, hint_row, hint_col = hint
+                                tell(f"Try {'digging' if action == 'dig' else 'flagging'} spot ({hint_col}, "
+                                     f"{hint_row}).")
+                            continue
+                        # Elif user wants the computer to finish the game, let the solver play it out
+                        elif user_input in auto_responses:
+                            if solver is None:
+                                solver = make_solver(game_board)
+                            safe = solver.solve(flag_mines=True)
+                            moved = True
+                            break
+                        # Elif user wants to save the game, save it and ask again
+                        elif user_input in save_responses:
+                            saved_game = save_game(game_board, saved_game)
+                            continue
+                        # Elif user wants to undo or redo a move, do it and ask again
+                        elif user_input in undo_responses + redo_responses:
+                            undo_move(game_board, undo=user_input in undo_responses)
+                            continue
+                        # Elif user wants to look at another part of a big board, move the view and ask again
+                        elif move_view(game_board, user_input):
+                            continue
+                        # Elif user asked to see the board or how things are going, show them (even in a quiet script)
+                        elif user_input in board_responses:
+                            tell(game_board)
+                            continue
+                        elif user_input in status_responses:
+                            tell(game_status(game_board, results))
+                            continue
+                        # Elif user typed out whole moves, like 'd 2, 3' or 'f 2, 3; d 4, 5; d 6, 7', make them all
+                        # and only show the board once they're done
+                        elif moves is not None:
+                            for action, row, col in moves:
+                                if action == 'dig':
+                                    safe = game_board.dig_spot(row, col)
+                                else:
+                                    safe = game_board.flag_spot(row, col)
+                                if not safe or game_board.safe_spots_left == 0:
+                                    break
+                            moved = True
+                            break
+
+                        # Otherwise it has to be a spot in col, row form (parse_spot() raises ValueError if it isn't)
+                        row, col = parse_spot(user_input, game_board.dim_size)
 
                         # If the user has already dug at that spot, ask them to pick a new spot
-                        if (row, col) in game_board.dug:
-                            print("Please pick a spot where you haven't dug yet.")
+                        if game_board.is_dug(row, col):
+                            tell("Please pick a spot where you haven't dug yet.")
                             continue
 
                         break  # Can only get here if there are no errors and Board.restart_game is False
 
                     except ValueError:
-                        print(f"Please enter 2 integers between 0 and {game_board.dim_size - 1} in col, row form "
-                              f"(for example: 2, 3.), enter 'settings' to adjust game settings, or enter 'quit' to "
-                              f"quit the game.")
+                        tell(f"Please enter 2 integers between 0 and {game_board.dim_size - 1} in col, row form "
+                             f"(for example: 2, 3.), enter 'settings' to adjust game settings, 'hint' for a hint, "
+                             f"'auto' to let the computer finish the game, or enter 'quit' to quit the game.")
 
-                # Check that user inputs D or F
-                while not game_board.restart_game:
+                # Check that user inputs D or F (unless the solver already finished the game)
+                while not game_board.restart_game and not moved:
                     print(f"\nWould you like to dig (D) or flag (F) spot ({col}, {row})?")
-                    user_action = input("> ").lower().strip()
+                    user_action = ask("> ").lower().strip()
 
                     if user_action in quit_responses:
                         quit_game()
@@ -479,33 +1213,86 @@ def play():
                         safe = game_board.dig_spot(row, col)
                         break
                     else:
-                        print(f"Please enter 'D' to dig in spot ({col}, {row}), 'F' to flag that spot,"
-                              f"'settings' to adjust game settings, or 'quit' to quit the game.")
+                        tell(f"Please enter 'D' to dig in spot ({col}, {row}), 'F' to flag that spot,"
+                             f"'settings' to adjust game settings, or 'quit' to quit the game.")
+
+                # The move is already in the save file (if there is one); this just makes sure it's on the disk. Same
+                # goes for the move log.
+                if saved_game is not None:
+                    saved_game.flush()
+                if game_board.move_log is not None:
+                    game_board.move_log.flush()
 
                 # If user dug a bomb or is restarting game to adjust variables, break out of this current game loop
                 if not safe or game_board.restart_game:
                     break
 
+            # The next game is a new one, so stop saving to the file (which keeps the finished game)
+            if saved_game is not None:
+                saved_game.close()
+                saved_game = None
+
             # 3 ways to end loop: restarting game to change dim/bombs, ran out of space (safe!), dug a bomb (not safe)
             if game_board.restart_game:
                 game_board.reset_board()
                 break
             elif safe:
-                sleep(1)
+                results['won'] += 1
+                pause(1)
                 print("CONGRATULATIONS!!! YOU WON!!")
             else:
-                sleep(1)
+                results['lost'] += 1
+                pause(1)
                 print("Oof magoof. You died")
 
             # let's reveal the whole board
-            sleep(1)
-            game_board.dug = [(r, c) for r in range(game_board.dim_size) for c in range(game_board.dim_size)]
-            print(game_board)
-            sleep(1)
+            pause(1)
+            game_board.reveal_board()
+            show_board(game_board)
+            pause(1)
 
             # Reset the game_board values before jumping into the next game
             game_board.reset_board()
 
 
+# Plays the game from a script instead of the keyboard. `script` is a file (or anything with readline()) with one line
+# per answer, just as they'd be typed at the prompts, e.g. '9', '10', 'd 4, 4', 'f 0, 0; d 1, 2; d 7, 3', 'status'.
+# By default nothing is printed apart from what the script asks for (like 'board', 'status' or 'hint') and messages
+# about lines that weren't accepted, and there are no pauses, so games go as fast as the board can play them.
+# Returns once the script quits or runs out of lines.
+def run_script(script, save_path=None, log_path=None, quiet=True, delays=False, seed=None):
+    console.script, console.quiet, console.delays, console.out = script, quiet, delays, sys.stdout
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull if quiet else sys.stdout):
+            play(save_path, log_path, seed)
+    except SystemExit:
+        pass
+    finally:
+        console.script, console.quiet, console.delays, console.out = None, False, True, None
+
+
 if __name__ == '__main__':
-    play()
+    parser = argparse.ArgumentParser(description="Play Minesweeper in the terminal.")
+    parser.add_argument('save_file', nargs='?', help="a saved game to pick back up")
+    parser.add_argument('--log', help="file to record every move to, so games can be replayed later")
+    parser.add_argument('--script', help="file to read input from, one answer per line ('-' for stdin). Nothing is "
+                                         "printed apart from what the script asks for (like 'board', 'status' or "
+                                         "'hint') and messages about lines that weren't accepted.")
+    parser.add_argument('--echo', action='store_true', help="with --script, print everything like a normal game")
+    parser.add_argument('--no-delay', action='store_true', help="don't pause between messages")
+    parser.add_argument('--seed', type=int, help="make the same boards every time")
+    parser.add_argument('--stats', action='store_true', help="time the board's hot paths (input 'stats' to see them)")
+    parser.add_argument('--stats-out', help="file to write the stats to as JSON when the game ends (implies --stats)")
+    args = parser.parse_args()
+    if args.stats or args.stats_out:
+        import instrument
+        instrument.enable(sys.modules[__name__])
+        if args.stats_out:
+            atexit.register(instrument.save_json, args.stats_out)
+    if args.script is not None:
+        with (open(args.script) if args.script != '-' else contextlib.nullcontext(sys.stdin)) as script:
+            run_script(script, args.save_file, args.log, quiet=not args.echo, delays=not args.no_delay and args.echo,
+                       seed=args.seed)
+    else:
+        console.delays = not args.no_delay
+        play(args.save_file, args.log, args.seed)
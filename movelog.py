@@ -0,0 +1,267 @@
+import argparse
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import add_game_to_totals, empty_totals, merge_totals, summarize
+from main import BOMB, Board
+from neighbours import TOPOLOGIES
+
+# A compact log of every dig & flag made on a board, which is enough to rebuild any game exactly: the board comes
+# from its seed, and the moves are replayed on top of it. Attach a MoveLog to a board (board.move_log = MoveLog(...))
+# and every make_new_board(), dig and flag is written to it.
+#
+# File layout: MAGIC and a version byte, then one record per game. Everything in a record is a varint (7 bits per
+# byte, lowest bits first, with the top bit set on every byte but the last):
+#   0                                   starts a new game
+#   dim_size + 1, num_bombs + 1, shape + 1, zigzag(seed) + 1, safe spot + 1
+#                                       the board (shape is the topology's index in TOPOLOGIES, plus NO_GUESS_BOARD
+#                                       for no-guess boards, and the safe spot is 0 if there wasn't one, otherwise its
+#                                       index + 1)
+#   ((index << 1) | op) + 1             one per move, where op is DIG or FLAG and index is the spot's index
+# Every number apart from the game marker has 1 added to it, so a 0 byte only ever appears as a game marker and a log
+# can be split into games with a single bytes.split() (which is what lets the verifier hand games out to processes
+# without decoding the whole log first). Most moves on boards up to 90x90 take 2 bytes.
+
+MAGIC = b'MSWL'
+VERSION = 1
+DIG = 0
+FLAG = 1
+NO_GUESS_BOARD = 0x08
+
+
+def encode_varint(value, out):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varints(data):
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = shift = 0
+    return values
+
+
+# Seeds can be negative, so they're zigzag-encoded (0, -1, 1, -2, ... -> 0, 1, 2, 3, ...) to keep them varints
+def zigzag(n):
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def unzigzag(n):
+    return n >> 1 if n % 2 == 0 else -(n >> 1) - 1
+
+
+class MoveLog:
+    # Pass a path to append to a log file (it's created if it doesn't exist), or nothing to keep the log in memory
+    # (see getvalue()). Moves are buffered and written out every buffer_size bytes, on flush() and on close().
+    def __init__(self, path=None, buffer_size=1 << 16):
+        self.path = path
+        self.file = open(path, 'ab') if path is not None else io.BytesIO()
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size
+        if self.file.tell() == 0:
+            self.buffer += MAGIC + bytes([VERSION])
+        elif path is not None:
+            with open(path, 'rb') as existing:
+                if existing.read(len(MAGIC) + 1) != MAGIC + bytes([VERSION]):
+                    raise ValueError(f"'{path}' isn't a version {VERSION} move log.")
+
+    # Starts logging a new game on a board that's just been made (Board.make_new_board() calls this)
+    def new_game(self, board):
+        if not isinstance(board.seed, int):
+            raise ValueError("Only boards made from an integer seed can be logged.")
+        safe_spot = 0 if board.safe_spot is None else board.index(*board.safe_spot) + 1
+        shape = TOPOLOGIES.index(board.topology) | (NO_GUESS_BOARD if board.no_guess else 0)
+        self.buffer.append(0)
+        for value in (board.dim_size, board.num_bombs, shape, zigzag(board.seed), safe_spot):
+            encode_varint(value + 1, self.buffer)
+
+    def dig(self, index):
+        self.add_move(index, DIG)
+
+    def flag(self, index):
+        self.add_move(index, FLAG)
+
+    def add_move(self, index, op):
+        buffer = self.buffer
+        value = (index << 1 | op) + 1
+        if value < 0x80:
+            buffer.append(value)
+        else:
+            encode_varint(value, buffer)
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+
+    # Starts logging a board that's already being played: logs the board, then a dig for every dug spot and a flag for
+    # every flagged spot. Digging the dug spots again in any order digs exactly the same spots, so the replayed board
+    # ends up the same (as long as a dug bomb goes last, since nothing can be dug once the game's over).
+    def attach(self, board):
+        board.move_log = self
+        if board.cells is not None:
+            self.new_game(board)
+            for i in sorted(board.dug, key=lambda i: board.cells[i] & BOMB):
+                self.dig(i)
+            for i in board.flags:
+                self.flag(i)
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.file.flush()
+        self.buffer = bytearray()
+
+    # Everything logged so far (only for logs kept in memory)
+    def getvalue(self):
+        self.flush()
+        return self.file.getvalue()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            if self.path is not None:
+                self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# --- Replay
+# Splits a log (the bytes of a whole log file) into one bytes object per game
+def split_games(data):
+    if data[:len(MAGIC) + 1] != MAGIC + bytes([VERSION]):
+        raise ValueError(f"This isn't a version {VERSION} move log.")
+    return data[len(MAGIC) + 1:].split(b'\x00')[1:]
+
+
+# Turns one game's bytes into (board settings, list of moves), where each move is ((index << 1) | op)
+def parse_game(record):
+    values = decode_varints(record)
+    if len(values) < 5 or min(values) == 0:
+        raise ValueError("This game's record is damaged.")
+    dim_size, num_bombs, shape, seed, safe_spot = (v - 1 for v in values[:5])
+    topology = shape & ~NO_GUESS_BOARD
+    if topology >= len(TOPOLOGIES):
+        raise ValueError("This game's record is damaged.")
+    settings = {'dim_size': dim_size, 'num_bombs': num_bombs, 'topology': TOPOLOGIES[topology],
+                'seed': unzigzag(seed), 'safe_spot': divmod(safe_spot - 1, dim_size) if safe_spot else None,
+                'no_guess': bool(shape & NO_GUESS_BOARD)}
+    return settings, [v - 1 for v in values[5:]]
+
+
+def read_games(path):
+    with open(path, 'rb') as file:
+        data = file.read()
+    for record in split_games(data):
+        yield parse_game(record)
+
+
+# Rebuilds a game from its settings & moves. Returns (the board at the end of the game, a result dict in the same
+# form as engine.play_game() returns, so replayed games can go into the same stats as simulated ones). Raises
+# ValueError if a move is off the board or comes after the game was already over, since that means the log doesn't
+# match how the game works any more (or it's damaged).
+def replay(settings, moves):
+    board = Board()
+    board.dim_size = settings['dim_size']
+    board.num_bombs = settings['num_bombs']
+    board.topology = settings['topology']
+    # No-guess boards come out the same however many processes look for them, so one is plenty here (replays are
+    # usually already running in a verifier process)
+    board.no_guess = settings.get('no_guess', False)
+    board.no_guess_workers = 1
+    board.make_new_board(settings['seed'], settings['safe_spot'])
+
+    dim, size = board.dim_size, board.dim_size ** 2
+    reveal_sizes = []
+    for n, move in enumerate(moves):
+        index = move >> 1
+        if index >= size:
+            raise ValueError(f"Move {n} is off the board.")
+        if board.exploded or board.safe_spots_left == 0:
+            raise ValueError(f"Move {n} comes after the game was already over.")
+        if move & 1 == DIG:
+            reveal_sizes.append(len(board.dig_region(*divmod(index, dim))))
+        else:
+            board.flag_spot(*divmod(index, dim))
+
+    state = 'lost' if board.game_lost() else 'won' if board.game_won() else 'playing'
+    return board, {'state': state, 'moves': len(moves), 'reveal_sizes': reveal_sizes}
+
+
+# --- Verifier
+# Replays a chunk of game records (nothing is printed) and returns their combined stats plus any games that failed
+def verify_chunk(records, first_game):
+    totals = empty_totals()
+    errors = []
+    for n, record in enumerate(records, first_game):
+        try:
+            add_game_to_totals(totals, replay(*parse_game(record))[1])
+        except ValueError as error:
+            errors.append({'game': n, 'error': str(error)})
+    return totals, errors
+
+
+# Replays every game in a log across a pool of worker processes and returns the same summary as engine.simulate()
+# plus a list of the games that couldn't be replayed
+def verify(path, workers=None, chunk_size=1000):
+    with open(path, 'rb') as file:
+        records = split_games(file.read())
+    chunks = [(records[start:start + chunk_size], start) for start in range(0, len(records), chunk_size)]
+
+    totals, errors = empty_totals(), []
+    if workers == 1 or len(chunks) <= 1:
+        results = (verify_chunk(*chunk) for chunk in chunks)
+        for chunk_totals, chunk_errors in results:
+            merge_totals(totals, chunk_totals)
+            errors += chunk_errors
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+            for chunk_totals, chunk_errors in executor.map(verify_chunk, *zip(*chunks)):
+                merge_totals(totals, chunk_totals)
+                errors += chunk_errors
+    return dict(summarize(totals), errors=errors)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay and verify logged Minesweeper games.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    verify_parser = subparsers.add_parser('verify', help="replay every game in a log and print their stats")
+    verify_parser.add_argument('log')
+    verify_parser.add_argument('--workers', type=int, default=None, help="number of processes (default: one per CPU)")
+    verify_parser.add_argument('--chunk-size', type=int, default=1000)
+    show_parser = subparsers.add_parser('show', help="replay one game from a log and print how it ended")
+    show_parser.add_argument('log')
+    show_parser.add_argument('game', type=int, help="which game in the log to show (0 is the first)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'verify':
+        summary = verify(args.log, args.workers, args.chunk_size)
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+        if summary['errors']:
+            sys.exit(1)
+    else:
+        with open(args.log, 'rb') as file:
+            records = split_games(file.read())
+        if not 0 <= args.game < len(records):
+            sys.exit(f"The log only has {len(records)} games.")
+        settings, moves = parse_game(records[args.game])
+        board, result = replay(settings, moves)
+        print(json.dumps(dict(settings, state=result['state'], moves=result['moves'])))
+        board.reveal_board()
+        print(board.render_board())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+from array import array
+from functools import lru_cache
+
+# Neighbour tables: for a board of a given size and shape, the indices of the spots around each spot, all stored in
+# two flat arrays (the "compressed sparse row" layout): the neighbours of spot i are
+# indices[offsets[i]:offsets[i + 1]]. Building a table takes one pass over the board, and after that finding a spot's
+# neighbours is a single slice instead of a couple of nested loops with max()/min() clamping, wrapping or row shifts.
+# A table takes ~36 bytes per spot though (several times the board itself), so square boards don't get one: their
+# neighbours are quick to work out on the fly, and SquareNeighbours does that behind the same [i] lookup. The last few
+# tables built are cached by (dim size, topology) so that boards of the same size & shape share one.
+#
+# Topologies:
+#   'square' - the normal board: up to 8 neighbours, fewer along the edges
+#   'torus'  - the edges wrap around, so every spot has 8 neighbours (for boards at least 3x3)
+#   'hex'    - hexagonal spots with up to 6 neighbours. Odd rows are shifted half a spot to the right, so spots in the
+#              rows above & below an even row are at (col - 1, col), and for an odd row they're at (col, col + 1).
+
+TOPOLOGIES = ('square', 'torus', 'hex')
+
+
+class NeighbourTable:
+    def __init__(self, dim_size, topology, offsets, indices):
+        self.dim_size = dim_size
+        self.topology = topology
+        self.offsets = offsets
+        self.indices = indices
+
+    def __getitem__(self, i):
+        return self.indices[self.offsets[i]:self.offsets[i + 1]]
+
+
+# Stands in for a NeighbourTable on square boards, clamping the 3x3 block around a spot to the board's edges
+class SquareNeighbours:
+    def __init__(self, dim_size):
+        self.dim_size = dim_size
+        self.topology = 'square'
+
+    def __getitem__(self, i):
+        dim = self.dim_size
+        row, col = divmod(i, dim)
+        if 0 < row < dim - 1 and 0 < col < dim - 1:
+            # Spots away from the edge always have all 8 neighbours, so skip the range clamping
+            return i - dim - 1, i - dim, i - dim + 1, i - 1, i + 1, i + dim - 1, i + dim, i + dim + 1
+        return tuple(r * dim + c for r in range(max(0, row - 1), min(dim, row + 2))
+                     for c in range(max(0, col - 1), min(dim, col + 2)) if r != row or c != col)
+
+
+# Returns the neighbours of every spot on a board of the given size & topology, for looking up with [i]
+def neighbour_table(dim_size, topology='square'):
+    if topology == 'square':
+        return SquareNeighbours(dim_size)
+    return build_neighbour_table(dim_size, topology)
+
+
+# Returns the (row, col) offsets of the spots around a spot in the given row for a topology
+def neighbour_steps(topology, row):
+    if topology == 'hex':
+        side = -1 if row % 2 == 0 else 1
+        return ((-1, 0), (-1, side), (0, -1), (0, 1), (1, 0), (1, side))
+    return tuple((dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc)
+
+
+# Works out the neighbours of a single spot the slow way (only used for spots on the left & right edges)
+def spot_neighbours(dim_size, topology, row, col):
+    wrap = topology == 'torus'
+    spots = []
+    for dr, dc in neighbour_steps(topology, row):
+        r, c = row + dr, col + dc
+        if wrap:
+            r, c = r % dim_size, c % dim_size
+        elif not (0 <= r < dim_size and 0 <= c < dim_size):
+            continue
+        spot = r * dim_size + c
+        # On tiny tori the same spot can be reached more than one way (or be the spot itself)
+        if spot != row * dim_size + col and spot not in spots:
+            spots.append(spot)
+    return spots
+
+
+# Builds the table a row at a time. Every spot in a row that isn't on the left or right edge has the same neighbour
+# steps, and for each step the neighbours of those spots are just a range of indices, so the middle of each row is
+# filled in with one strided slice assignment per step instead of a loop over every spot.
+# Only a couple of tables are kept around, since big ones take a lot of memory.
+@lru_cache(maxsize=2)
+def build_neighbour_table(dim_size, topology):
+    if topology not in TOPOLOGIES:
+        raise ValueError(f"Unknown topology '{topology}'. Choose from: {', '.join(TOPOLOGIES)}.")
+
+    dim = dim_size
+    offsets = array('i', [0])
+    indices = array('i')
+    for row in range(dim):
+        if dim < 3:
+            for col in range(dim):
+                indices.extend(spot_neighbours(dim, topology, row, col))
+                offsets.append(len(indices))
+            continue
+
+        # The rows this row's steps land on (wrapped around on a torus, and dropped if they're off the board)
+        steps = [((row + dr) % dim, dc) for dr, dc in neighbour_steps(topology, row)
+                 if topology == 'torus' or 0 <= row + dr < dim]
+        num_steps = len(steps)
+        middle = array('i', bytes(indices.itemsize * num_steps * (dim - 2)))
+        for n, (r, dc) in enumerate(steps):
+            middle[n::num_steps] = array('i', range(r * dim + 1 + dc, r * dim + dim - 1 + dc))
+
+        indices.extend(spot_neighbours(dim, topology, row, 0))
+        offsets.append(len(indices))
+        offsets.extend(range(len(indices) + num_steps, len(indices) + len(middle) + 1, num_steps))
+        indices.extend(middle)
+        indices.extend(spot_neighbours(dim, topology, row, dim - 1))
+        offsets.append(len(indices))
+    return NeighbourTable(dim_size, topology, offsets, indices)
@@ -0,0 +1,142 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from main import BOMB, Board
+from probability import ProbabilityEngine
+from solver import Solver
+
+# Generates "no-guess" boards: boards that can be finished from a given first dig using logic alone, without ever
+# having to guess.
+#
+# Candidate boards are made the normal way from the seed (candidate k uses the seed f"{seed}:{k}"), then played out by
+# the solver from the first dig. Whenever the solver's rules get stuck, the exact bomb chances from probability.py are
+# checked too, since any spot with a 0% (or 100%) chance is certain even if the simple rules can't see it. If that's
+# still not enough, one of the bombs the solver is stuck on is moved somewhere that hasn't been reached yet (a local
+# repair) and the solver carries on from where it was, so most candidates get fixed instead of thrown away.
+# Moving a bomb changes numbers the solver has already used, so once a candidate has been repaired it's played through
+# once more from the start to make sure it really can be solved without guessing.
+#
+# Candidates are checked in rounds across a pool of processes, and the result is the lowest-numbered candidate that
+# worked. That's the same candidate no matter how many processes there are, so a seed & first dig always give the same
+# board (which is what lets saved games and move logs rebuild no-guess boards from their seed).
+
+MAX_CANDIDATES = 1000
+MAX_REPAIRS = 100
+
+
+# Returns the bomb spots of the no-guess board for these settings
+def no_guess_bomb_spots(dim_size, num_bombs, topology, seed, safe_spot, workers=None):
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for k in range(MAX_CANDIDATES):
+            bomb_spots = try_candidate(dim_size, num_bombs, topology, seed, safe_spot, k)
+            if bomb_spots is not None:
+                return bomb_spots
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for first in range(0, MAX_CANDIDATES, workers):
+                futures = [executor.submit(try_candidate, dim_size, num_bombs, topology, seed, safe_spot, k)
+                           for k in range(first, min(first + workers, MAX_CANDIDATES))]
+                # Candidates finish in any order, but take the lowest-numbered one that worked so the board doesn't
+                # depend on the number of processes
+                for future in futures:
+                    bomb_spots = future.result()
+                    if bomb_spots is not None:
+                        for other in futures:
+                            other.cancel()
+                        return bomb_spots
+    raise ValueError(f"Couldn't find a no-guess board with {num_bombs} bombs on a {dim_size}x{dim_size} board "
+                     f"after {MAX_CANDIDATES} tries. Try fewer bombs.")
+
+
+# Makes candidate k and repairs it until it can be solved without guessing. Returns its bomb spots, or None if it
+# couldn't be fixed.
+def try_candidate(dim_size, num_bombs, topology, seed, safe_spot, k, max_repairs=MAX_REPAIRS):
+    board = Board()
+    board.dim_size = dim_size
+    board.num_bombs = num_bombs
+    board.topology = topology
+    board.make_new_board(f"{seed}:{k}", safe_spot)
+    rng = random.Random(f"{seed}:{k}:repairs")
+
+    repairs_left = max_repairs
+    while True:
+        repairs = solve_without_guessing(board, safe_spot, rng, repairs_left)
+        if repairs is None:
+            return None
+        if repairs == 0:
+            return [i for i, cell in enumerate(board.cells) if cell & BOMB]
+        repairs_left -= repairs
+
+
+# Plays the board from the safe spot using only certain moves, repairing it whenever the solver gets stuck. Returns
+# how many repairs it took to get to the end of the board (0 means the board could already be solved without
+# guessing), or None if it got stuck and couldn't be repaired within max_repairs.
+def solve_without_guessing(board, safe_spot, rng, max_repairs):
+    board.clear_dug()
+    solver = Solver(board)
+    engine = ProbabilityEngine(solver)
+    if not solver.dig(board.index(*safe_spot)):
+        return None
+
+    repairs = 0
+    while not board.game_won():
+        stuck = find_stuck_spots(solver, engine)
+        if stuck is None:
+            continue
+        moved_from = repair(board, stuck, rng) if repairs < max_repairs else None
+        if moved_from is None:
+            return None
+        repairs += 1
+        # The numbers around the bomb's old spot just went down by one, so they need checking again
+        solver.neighbours_changed(moved_from)
+    return repairs
+
+
+# Makes as much progress as the solver can without guessing (digging every spot it's sure is safe). Returns None if it
+# made progress, or the undug spots next to dug numbers that it couldn't work out if it's stuck.
+def find_stuck_spots(solver, engine):
+    solver.deduce()
+    if solver.safe:
+        while solver.safe:
+            solver.dig(solver.safe.pop())
+        return None
+
+    # The simple rules are stuck, so look for spots that the exact chances say are certain
+    chances, interior_chance = engine.probabilities()
+    certain_safe = [i for i, chance in chances.items() if chance == 0.0]
+    certain_mines = [i for i, chance in chances.items() if chance == 1.0]
+    if interior_chance in (0.0, 1.0):
+        (certain_safe if interior_chance == 0.0 else certain_mines).extend(solver.interior_spots())
+    if not certain_safe and not certain_mines:
+        return [i for i in chances if i not in solver.safe]
+    solver.mark_mines(certain_mines)
+    solver.mark_safe(certain_safe)
+    return None
+
+
+# Moves one of the bombs the solver is stuck on to a random undug spot that isn't next to anything dug yet, so none of
+# the numbers the solver has already seen change apart from the ones around the bomb's old spot. Returns the bomb's
+# old spot, or None if there's no bomb to move or nowhere to move it to.
+def repair(board, stuck, rng):
+    stuck_bombs = [i for i in stuck if board.cells[i] & BOMB]
+    if not stuck_bombs:
+        return None
+
+    # Most of the board usually hasn't been reached yet, so try a few random spots before looking through all of them
+    def can_move_to(i):
+        return not (board.cells[i] & BOMB or i in board.dug or any(j in board.dug for j in board.neighbours[i]))
+
+    size = len(board.cells)
+    destination = next((i for i in (rng.randrange(size) for _ in range(32)) if can_move_to(i)), None)
+    if destination is None:
+        destinations = [i for i in range(size) if can_move_to(i)]
+        if not destinations:
+            return None
+        destination = rng.choice(destinations)
+
+    moved_from = rng.choice(stuck_bombs)
+    dim = board.dim_size
+    board.move_bomb(*divmod(moved_from, dim), *divmod(destination, dim))
+    return moved_from
@@ -0,0 +1,246 @@
+from fractions import Fraction
+
+from solver import Solver, solver_policy
+
+# Works out the exact chance that each unknown spot is a bomb, for when the solver can't find a spot that's definitely
+# safe. Trying every possible layout of the bombs is exponential, so instead:
+#   1. The unknown spots next to dug numbers (the frontier) are split into groups ("components") that don't share any
+#      numbers, since how the bombs are laid out in one group doesn't affect any other group.
+#   2. Each component's layouts are counted with a dynamic program that goes through its spots one by one and only
+#      remembers how many bombs each "open" number has been given so far, so layouts that look the same to the rest
+#      of the component are counted together. For every possible number of bombs in the component, this gives how
+#      many layouts there are and, for each spot, how many of those layouts have a bomb there.
+#   3. The components are combined, and the spots that don't touch any number (the interior) are weighted with the
+#      number of ways to place the rest of the bombs among them (a binomial coefficient).
+# Components don't change much from one move to the next, so each one's counts are cached by its shape and reused.
+
+
+class ProbabilityEngine:
+    def __init__(self, solver, cache_size=4096):
+        self.solver = solver
+        self.cache = {}
+        self.cache_size = cache_size
+
+    # Returns a dict of {spot index: chance it's a bomb} for every unknown spot on the frontier, plus the chance that
+    # any one interior spot is a bomb (or None if there aren't any interior spots).
+    def probabilities(self):
+        solver = self.solver
+        board = solver.board
+        solver.sync()
+        solver.deduce()
+
+        # Gather the constraints on the frontier, and split the frontier spots into components
+        constraints = []
+        for i in solver.frontier:
+            unknown, bombs_left = solver.constraint(i)
+            if unknown:
+                constraints.append((tuple(sorted(unknown)), bombs_left))
+        components = split_components(constraints)
+
+        frontier_spots = {v for spots, _ in constraints for v in spots}
+        num_unknown = board.dim_size ** 2 - board.num_dug - len(solver.mines) - len(solver.safe)
+        num_interior = num_unknown - len(frontier_spots)
+        bombs_left = board.num_bombs - len(solver.mines)
+
+        # Count each component's layouts (from the cache if we've seen the same shape before)
+        counted = [self.count_component(component) for component in components]
+
+        # weight(t) is proportional to the number of ways to put the bombs that aren't on the frontier in the
+        # interior if the frontier holds t bombs in total, i.e. comb(num_interior, bombs_left - t)
+        weight = interior_weights(num_interior, bombs_left, len(frontier_spots))
+
+        # For each component, the number of layouts of all of the *other* components for each total number of bombs
+        distributions = [[ways for ways, _ in result] for _, result in counted]
+        others = convolve_all_but_one(distributions)
+        # frontier_total[t] = number of layouts of the whole frontier with t bombs
+        frontier_total = convolve(others[0], distributions[0]) if distributions else [1]
+        total = sum(ways * weight(t) for t, ways in enumerate(frontier_total))
+        if total == 0:
+            raise ValueError("The board's numbers don't match any layout of the remaining bombs.")
+
+        chances = {i: 0.0 for i in solver.safe}
+        for (spots, result), rest in zip(counted, others):
+            # weighted[k] = how much a layout with k bombs in this component counts for, after combining it with
+            # every layout of the other components and of the interior
+            weighted = [sum(ways * weight(k + t) for t, ways in enumerate(rest)) for k in range(len(result))]
+            for position, spot in enumerate(spots):
+                bomb_weight = sum(counts[position] * weighted[k] for k, (_, counts) in enumerate(result) if counts)
+                chances[spot] = float(bomb_weight / total)
+
+        interior_chance = None
+        if num_interior > 0:
+            interior_bombs = sum(ways * weight(t) * (bombs_left - t) for t, ways in enumerate(frontier_total))
+            interior_chance = float(interior_bombs / (total * num_interior))
+        return chances, interior_chance
+
+    # Returns (spot index, chance it's a bomb) for the unknown spot that's least likely to be a bomb
+    def safest_guess(self):
+        chances, interior_chance = self.probabilities()
+        best = min(chances.items(), key=lambda item: item[1], default=None)
+        if interior_chance is not None and (best is None or interior_chance < best[1]):
+            return self.pick_interior_spot(), interior_chance
+        return best
+
+    # Any interior spot is as good as any other, so pick one at random
+    def pick_interior_spot(self):
+        return self.solver.rng.choice(self.solver.interior_spots())
+
+    # Returns (the component's spots, its counts), where counts[k] = (number of layouts with k bombs, list of how many
+    # of those layouts have a bomb on each spot). Components are cached by their shape with the spot indices shifted
+    # so the smallest one is 0, so the same shape anywhere on the board is only ever counted once.
+    def count_component(self, component):
+        spots = sorted({v for component_spots, _ in component for v in component_spots})
+        base = spots[0]
+        shape = tuple(sorted((tuple(v - base for v in component_spots), bombs_left)
+                             for component_spots, bombs_left in component))
+        result = self.cache.get(shape)
+        if result is None:
+            if len(self.cache) >= self.cache_size:
+                self.cache.clear()
+            result = self.cache[shape] = count_layouts(shape)
+        relative_spots, counts = result
+        return [v + base for v in relative_spots], counts
+
+
+# Groups constraints (spots, bombs_left) into components of constraints that are connected by shared spots
+def split_components(constraints):
+    parent = {}
+
+    def find(v):
+        while parent[v] != v:
+            parent[v] = parent[parent[v]]
+            v = parent[v]
+        return v
+
+    for spots, _ in constraints:
+        for v in spots:
+            parent.setdefault(v, v)
+        root = find(spots[0])
+        for v in spots[1:]:
+            parent[find(v)] = root
+
+    components = {}
+    for constraint in constraints:
+        components.setdefault(find(constraint[0][0]), []).append(constraint)
+    return list(components.values())
+
+
+# Counts every layout of bombs on the spots of a component that fits its constraints. Returns (spots, counts) where
+# counts[k] = (number of layouts with k bombs, list of how many of those layouts have a bomb on each spot).
+# The spots are visited in breadth-first order so that each number is "open" (has some but not all of its spots
+# decided) for as short a time as possible, which keeps the number of distinct states small.
+def count_layouts(constraints):
+    spot_constraints = {}
+    for c, (spots, _) in enumerate(constraints):
+        for v in spots:
+            spot_constraints.setdefault(v, []).append(c)
+
+    order, seen = [], set()
+    for start in sorted(spot_constraints):
+        if start in seen:
+            continue
+        queue = [start]
+        seen.add(start)
+        for v in queue:
+            order.append(v)
+            for c in spot_constraints[v]:
+                for w in constraints[c][0]:
+                    if w not in seen:
+                        seen.add(w)
+                        queue.append(w)
+    position = {v: p for p, v in enumerate(order)}
+
+    targets = [bombs_left for _, bombs_left in constraints]
+    last = [max(position[v] for v in spots) for spots, _ in constraints]
+    # spots_after[(c, p)] = how many of constraint c's spots come after position p
+    spots_after = {}
+    for c, (spots, _) in enumerate(constraints):
+        positions = sorted(position[v] for v in spots)
+        for n, p in enumerate(positions):
+            spots_after[c, p] = len(positions) - n - 1
+
+    # states maps (bombs given so far to each open constraint) -> {bombs so far: [layouts, per-spot bomb counts]}
+    open_constraints = ()
+    states = {(): {0: [1, []]}}
+    for p, v in enumerate(order):
+        touching = spot_constraints[v]
+        next_open = tuple(sorted(c for c in set(open_constraints) | set(touching) if last[c] > p))
+        next_states = {}
+        for key, by_bombs in states.items():
+            given = dict(zip(open_constraints, key))
+            for bomb in (0, 1):
+                new_given = {}
+                for c in touching:
+                    n = given.get(c, 0) + bomb
+                    if n > targets[c] or n + spots_after[c, p] < targets[c]:
+                        break
+                    new_given[c] = n
+                else:
+                    new_key = tuple(new_given[c] if c in new_given else given.get(c, 0) for c in next_open)
+                    bucket = next_states.setdefault(new_key, {})
+                    for k, (ways, counts) in by_bombs.items():
+                        entry = bucket.get(k + bomb)
+                        if entry is None:
+                            bucket[k + bomb] = [ways, counts + [ways * bomb]]
+                        else:
+                            entry[0] += ways
+                            entry[1] = [a + b for a, b in zip(entry[1], counts + [ways * bomb])]
+        states, open_constraints = next_states, next_open
+
+    by_bombs = states.get((), {})
+    max_bombs = max(by_bombs, default=-1)
+    counts = [tuple(by_bombs[k]) if k in by_bombs else (0, None) for k in range(max_bombs + 1)]
+    return order, counts
+
+
+def convolve(a, b):
+    result = [0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x:
+            for j, y in enumerate(b):
+                result[i + j] += x * y
+    return result
+
+
+# For each list in `distributions`, returns the convolution of all of the other lists (using prefix & suffix products
+# so it's not redone from scratch for each one)
+def convolve_all_but_one(distributions):
+    prefixes = [[1]]
+    for distribution in distributions[:-1]:
+        prefixes.append(convolve(prefixes[-1], distribution))
+    result = [None] * len(distributions)
+    suffix = [1]
+    for i in range(len(distributions) - 1, -1, -1):
+        result[i] = convolve(prefixes[i], suffix)
+        suffix = convolve(suffix, distributions[i])
+    return result
+
+
+# Returns weight(t), which is proportional to comb(num_interior, bombs_left - t). The weights are worked out as exact
+# fractions relative to the smallest one that's needed, since the binomial coefficients themselves can have thousands
+# of digits on big boards.
+def interior_weights(num_interior, bombs_left, max_frontier_bombs):
+    low = max(0, bombs_left - max_frontier_bombs)
+    weights = {}
+    w = Fraction(1)
+    for m in range(low, min(bombs_left, num_interior) + 1):
+        weights[bombs_left - m] = w
+        w = w * (num_interior - m) / (m + 1)
+    return lambda t: weights.get(t, 0)
+
+
+# Guesser for Solver: dig the spot that's least likely to be a bomb. The engine is kept on the solver so its cache
+# carries over from one guess to the next.
+def safest_guess(solver):
+    engine = getattr(solver, 'probability_engine', None)
+    if engine is None:
+        engine = solver.probability_engine = ProbabilityEngine(solver)
+    return engine.safest_guess()[0]
+
+
+# Move policy for engine.simulate(): like solver_policy, but guessing the safest spot instead of a random one
+def probability_policy(game, rng):
+    solver = getattr(game, 'solver', None)
+    if solver is None and game.board.cells is not None:
+        game.solver = Solver(game.board, guesser=safest_guess, seed=rng.random())
+    return solver_policy(game, rng)
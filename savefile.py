@@ -0,0 +1,215 @@
+import mmap
+import os
+import struct
+
+from main import BOMB, Bitset, Board
+from neighbours import TOPOLOGIES, neighbour_table
+
+# Saving boards to disk in a small binary format, and opening saved boards with mmap so nothing has to be read or
+# parsed up front and every dig/flag goes straight into the file.
+#
+# File layout (all numbers little-endian):
+#   header    HEADER below: magic, format version, the board's size/bombs/topology, the seed & safe spot it was made
+#             from (if there was one), and where each bitmap starts
+#   symbols   one SYMBOL_SLOT-byte slot per name in SYMBOL_NAMES: a length byte followed by the symbol in UTF-8
+#   bitmaps   the bombs, dug spots and flagged spots, one bit per spot (bit i is bit i % 8 of byte i // 8, the same
+#             layout as Bitset.bits), each starting on an 8-byte boundary
+#
+# Everything else (the surrounding-bomb counts, num_dug, safe_spots_left, ...) is worked out from the bitmaps when the
+# board is loaded, so a dig or flag only ever has to change a bit in the file.
+
+MAGIC = b'MSWP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIIBBxxQIIQQQ')
+SYMBOL_NAMES = ('bomb', 'undug spot', 'no surrounding bombs', 'flag')
+SYMBOL_SLOT = 16
+
+# Header flags
+HAS_SEED = 0x01
+HAS_SAFE_SPOT = 0x02
+NO_GUESS = 0x04
+
+# Translation table that turns each spot's byte into '1' if it's a bomb and '0' if not, for packing the bombs into bits
+BOMB_TO_BIT = bytes(ord('1') if b & BOMB else ord('0') for b in range(256))
+
+
+# Works out where everything goes in a file for a board with `size` spots: returns (mines, dug, flags, file size)
+def layout(size):
+    bitmap_size = (size + 7) // 8
+    mines = align(HEADER.size + SYMBOL_SLOT * len(SYMBOL_NAMES))
+    dug = align(mines + bitmap_size)
+    flags = align(dug + bitmap_size)
+    return mines, dug, flags, flags + bitmap_size
+
+
+def align(offset):
+    return (offset + 7) & ~7
+
+
+# Writes the whole board to `path`. The file is written next to it first and then moved into place, so a crash part
+# way through saving never leaves a half-written save behind.
+def save_board(board, path):
+    size = len(board.cells)
+    mines_offset, dug_offset, flags_offset, file_size = layout(size)
+
+    flags = 0
+    seed = 0
+    if isinstance(board.seed, int) and 0 <= board.seed < 2 ** 64:
+        flags |= HAS_SEED
+        seed = board.seed
+    safe_row, safe_col = 0, 0
+    if board.safe_spot is not None:
+        flags |= HAS_SAFE_SPOT
+        safe_row, safe_col = board.safe_spot
+    if board.no_guess:
+        flags |= NO_GUESS
+
+    data = bytearray(file_size)
+    HEADER.pack_into(data, 0, MAGIC, VERSION, HEADER.size, board.dim_size, board.num_bombs,
+                     TOPOLOGIES.index(board.topology), flags, seed, safe_row, safe_col,
+                     mines_offset, dug_offset, flags_offset)
+    pack_symbols(data, board.symbols)
+    bitmap_size = (size + 7) // 8
+    mines = int(board.cells.translate(BOMB_TO_BIT)[::-1], 2)  # reversed so spot 0 ends up in the lowest bit
+    data[mines_offset:mines_offset + bitmap_size] = mines.to_bytes(bitmap_size, 'little')
+    data[dug_offset:dug_offset + bitmap_size] = board.dug.bits
+    data[flags_offset:flags_offset + bitmap_size] = board.flags.bits
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+def pack_symbols(data, symbols):
+    for n, name in enumerate(SYMBOL_NAMES):
+        encoded = symbols[name].encode()
+        if len(encoded) >= SYMBOL_SLOT:
+            raise ValueError(f"The {name} symbol is too long to save.")
+        start = HEADER.size + n * SYMBOL_SLOT
+        data[start:start + SYMBOL_SLOT] = bytes([len(encoded)]) + encoded.ljust(SYMBOL_SLOT - 1, b'\x00')
+
+
+# Reads a saved board into memory and closes the file again. Changes to the board aren't written back.
+def load_board(path, board=None):
+    with open(path, 'rb') as file:
+        data = file.read()
+    return forget_history(read_board(data, board if board is not None else Board(), copy=True))
+
+
+# Loading a game replaces whatever the board was in the middle of, so there's nothing left on it to undo. (Saving goes
+# through read_board() too, to switch the board over to the file, but that's still the same game so it keeps its
+# history.)
+def forget_history(board):
+    if board.history is not None:
+        board.history.clear()
+    return board
+
+
+# Fills in a Board from the bytes of a save file. With copy=False, the board's dug & flagged bitsets point straight
+# into `data` (which has to be writable, e.g. an mmap), so digging and flagging change `data` too.
+def read_board(data, board, copy):
+    if len(data) < HEADER.size:
+        raise ValueError("This isn't a Minesweeper save file (it's too short).")
+    (magic, version, header_size, dim_size, num_bombs, topology, flags, seed, safe_row, safe_col,
+     mines_offset, dug_offset, flags_offset) = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("This isn't a Minesweeper save file.")
+    if version != VERSION:
+        raise ValueError(f"Save files from version {version} aren't supported (this game reads version {VERSION}).")
+    size = dim_size ** 2
+    bitmap_size = (size + 7) // 8
+    if len(data) < max(mines_offset, dug_offset, flags_offset) + bitmap_size or topology >= len(TOPOLOGIES):
+        raise ValueError("This save file is damaged (it's been cut short or its header doesn't make sense).")
+
+    view = memoryview(data)
+    mines = view[mines_offset:mines_offset + bitmap_size]
+    dug = view[dug_offset:dug_offset + bitmap_size]
+    flagged = view[flags_offset:flags_offset + bitmap_size]
+    if copy:
+        dug, flagged = bytearray(dug), bytearray(flagged)
+
+    board.dim_size = dim_size
+    board.num_bombs = num_bombs
+    board.topology = TOPOLOGIES[topology]
+    board.seed = seed if flags & HAS_SEED else None
+    board.safe_spot = (safe_row, safe_col) if flags & HAS_SAFE_SPOT else None
+    board.no_guess = bool(flags & NO_GUESS)
+    for n, name in enumerate(SYMBOL_NAMES):
+        start = HEADER.size + n * SYMBOL_SLOT
+        board.symbols[name] = bytes(data[start + 1:start + 1 + data[start]]).decode()
+
+    # Rebuild the spots' bytes from the bomb bitmap, then count the surrounding bombs the same way make_new_board does
+    board.neighbours = neighbour_table(dim_size, board.topology)
+    board.cells = bytearray(Bitset(size, mines).spread(0, size, BOMB))
+    board.assign_values_to_board()
+    board.dug = Bitset(size, dug)
+    board.flags = Bitset(size, flagged)
+
+    # Work the running counters out from the bitmaps
+    dug_bombs = (int.from_bytes(dug, 'little') & int.from_bytes(mines, 'little')).bit_count()
+    board.num_dug = len(board.dug)
+    board.num_flags = len(board.flags)
+    board.exploded = dug_bombs > 0
+    board.safe_spots_left = size - num_bombs - (board.num_dug - dug_bombs)
+    board.dug_changes += 1
+    board.revealing_all = False
+    board.cursor = (dim_size // 2, dim_size // 2)
+    board.view = None
+    board.follow_cursor = True
+    board.spot_strings = None
+    board.clear_render_cache()
+    mines.release()
+    return board
+
+
+# A board that's saved in a file and kept in sync with it: the file is mapped into memory and the board's dug &
+# flagged bits live in the mapped pages, so each dig or flag changes just those bits in the file. Even if the game
+# crashes, whatever was dug or flagged is already in the file. Use it as a context manager or call close() when done.
+#
+#   with open_board('game.save') as saved:
+#       saved.board.dig_spot(3, 4)
+class BoardFile:
+    def __init__(self, path, board=None):
+        self.path = path
+        self.file = open(path, 'r+b')
+        self.mmap = mmap.mmap(self.file.fileno(), 0)
+        self.board = read_board(self.mmap, board if board is not None else Board(), copy=False)
+
+    # Writes the symbols back to the file (they're the only thing that can change that isn't a bit in a bitmap) and
+    # asks the OS to write the changed pages out to disk
+    def flush(self):
+        pack_symbols(self.mmap, self.board.symbols)
+        self.mmap.flush()
+
+    # Saves & closes the file. The board keeps working afterwards, it just has its own copy of the dug & flagged bits.
+    def close(self):
+        if self.mmap.closed:
+            return
+        self.flush()
+        board = self.board
+        if isinstance(board.dug, Bitset) and isinstance(board.dug.bits, memoryview):
+            board.dug = Bitset(board.dug.size, bytearray(board.dug.bits))
+            board.flags = Bitset(board.flags.size, bytearray(board.flags.bits))
+        self.mmap.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_board(path, board=None):
+    saved_game = BoardFile(path, board)
+    forget_history(saved_game.board)
+    return saved_game
+
+
+# Saves a board and then switches it over to the saved file, so the rest of the game is written back as it's played
+def save_and_open(board, path):
+    save_board(board, path)
+    return BoardFile(path, board)
@@ -0,0 +1,322 @@
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import statistics
+import sys
+import time
+
+from engine import Game
+from main import BOMB, COUNT_MASK
+from neighbours import TOPOLOGIES
+
+# A game server: hosts lots of independent games at once over TCP or a Unix socket, one Board per session, so
+# Minesweeper can be played by other programs (and by more than one person at a time). Everything runs on one asyncio
+# event loop, so there are no locks, and each session is just an engine.Game plus the time it was last used.
+#
+# The protocol is JSON lines: the client sends one JSON object per line and gets exactly one JSON object back per line,
+# in the same order. Every request has an "op", and can have an "id", which is copied into the reply so clients can
+# match replies up with requests. Replies have "ok": true, or "ok": false and an "error" message. "dim", "bombs",
+# "seed", "row" and "col" have to be JSON integers.
+#   {"op": "new", "dim": 9, "bombs": 10}      starts a game (optional: "seed", "topology"). Replies with its "session".
+#   {"op": "dig", "session": s, "row": r, "col": c}
+#   {"op": "flag", "session": s, "row": r, "col": c}
+#   {"op": "state", "session": s}             the whole visible board, as changes from an undug board
+#   {"op": "close", "session": s}             ends a session
+#   {"op": "stats"}                           how many sessions, connections & requests the server has
+# Instead of printing the board, dig, flag & state replies have "changed": a list of [row, col, value] for just the
+# spots that changed, where value is the number of surrounding bombs for a dug spot, "F" for a flag, or "B" for a dug
+# bomb. Once a game is lost the reply also has "bombs", a list of [row, col] for every bomb. Each reply has the game's
+# "status" (see Game.status()) too.
+#
+# Sessions aren't tied to the connection that made them, so a client can reconnect and carry on, but any session that
+# hasn't been used for idle_timeout seconds is thrown away. Each connection's requests are handled one at a time and the
+# reply is written before the next line is read, and when a client isn't reading its replies the server waits for the
+# socket to drain before reading any more from it, so a slow client only ever slows itself down (and its unread
+# replies can't pile up in the server's memory).
+#
+#   python server.py serve --port 8765
+#   python server.py load --port 8765 --clients 200 --games 20
+
+MAX_LINE = 64 * 1024
+BACKLOG = 4096  # how many connections can be waiting to be accepted, so thousands of clients can connect at once
+DEFAULT_MAX_DIM = 200
+DEFAULT_MAX_SESSIONS = 100000
+DEFAULT_IDLE_TIMEOUT = 300.0
+
+
+class Session:
+    def __init__(self, session_id, game):
+        self.id = session_id
+        self.game = game
+        self.last_used = time.monotonic()
+
+
+class GameServer:
+    def __init__(self, max_sessions=DEFAULT_MAX_SESSIONS, idle_timeout=DEFAULT_IDLE_TIMEOUT, max_dim=DEFAULT_MAX_DIM):
+        self.sessions = {}
+        self.session_ids = itertools.count(1)
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_dim = max_dim
+        self.connections = 0
+        self.requests = 0
+        self.evicted = 0
+        self.handlers = {'new': self.new_game, 'dig': self.dig, 'flag': self.flag, 'state': self.state,
+                         'close': self.close_session, 'stats': self.stats}
+
+    async def start(self, host='127.0.0.1', port=8765, unix_path=None):
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, unix_path, limit=MAX_LINE,
+                                                     backlog=BACKLOG)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_LINE, backlog=BACKLOG)
+        self.reaper = asyncio.create_task(self.evict_idle_sessions())
+        return server
+
+    # Handles one client until it disconnects
+    async def handle_connection(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # The line was longer than MAX_LINE, so the stream can't be trusted any more
+                    writer.write(encode({'ok': False, 'error': f"Lines can't be longer than {MAX_LINE} bytes."}))
+                    break
+                if not line:
+                    break
+                writer.write(encode(self.handle_line(line)))
+                # drain() only waits if the client has let its replies back up past the transport's high-water mark
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    # Turns one line of JSON into its reply
+    def handle_line(self, line):
+        self.requests += 1
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            return {'ok': False, 'error': "That isn't valid JSON."}
+        if not isinstance(request, dict):
+            return {'ok': False, 'error': "Requests have to be JSON objects."}
+
+        handler = self.handlers.get(request.get('op'))
+        if handler is None:
+            reply = {'ok': False, 'error': f"Unknown op. Choose from: {', '.join(self.handlers)}."}
+        else:
+            try:
+                reply = dict(handler(request), ok=True)
+            except KeyError as error:
+                reply = {'ok': False, 'error': f"'{request.get('op')}' needs '{error.args[0]}'."}
+            except (TypeError, ValueError, OverflowError) as error:
+                reply = {'ok': False, 'error': str(error)}
+        if 'id' in request:
+            reply['id'] = request['id']
+        return reply
+
+    # --- Ops
+    def new_game(self, request):
+        if len(self.sessions) >= self.max_sessions:
+            raise ValueError("The server is full. Try again later.")
+        dim, bombs = integer(request, 'dim'), integer(request, 'bombs')
+        if dim > self.max_dim:
+            raise ValueError(f"Boards can't be bigger than {self.max_dim}x{self.max_dim} on this server.")
+        topology = request.get('topology', 'square')
+        if topology not in TOPOLOGIES:
+            raise ValueError(f"Unknown topology '{topology}'. Choose from: {', '.join(TOPOLOGIES)}.")
+
+        seed = integer(request, 'seed') if request.get('seed') is not None else None
+        session = Session(str(next(self.session_ids)), Game(dim, bombs, seed, topology=topology))
+        self.sessions[session.id] = session
+        return {'session': session.id, 'status': session.game.status()}
+
+    def dig(self, request):
+        game = self.session(request).game
+        dug = game.dig(*spot(request))
+        reply = {'changed': [[r, c, cell_value(game.board, r, c)] for r, c in dug], 'status': game.status()}
+        if game.state == 'lost':
+            reply['bombs'] = bomb_spots(game.board)
+        return reply
+
+    def flag(self, request):
+        game = self.session(request).game
+        row, col = spot(request)
+        newly_flagged = game.flag(row, col)
+        return {'changed': [[row, col, 'F']] if newly_flagged else [], 'status': game.status()}
+
+    def state(self, request):
+        game = self.session(request).game
+        board = game.board
+        changed = [[row, col, 'F'] for row, col in game.pending_flags]
+        if board.cells is not None:
+            dim = board.dim_size
+            changed = [[*divmod(i, dim), 'F'] for i in board.flags if i not in board.dug]
+            changed += [[*divmod(i, dim), cell_value(board, *divmod(i, dim))] for i in board.dug]
+        reply = {'changed': changed, 'status': game.status()}
+        if game.state == 'lost':
+            reply['bombs'] = bomb_spots(board)
+        return reply
+
+    def close_session(self, request):
+        del self.sessions[self.session(request).id]
+        return {}
+
+    def stats(self, request):
+        return {'sessions': len(self.sessions), 'connections': self.connections, 'requests': self.requests,
+                'evicted': self.evicted}
+
+    # Looks up the request's session and marks it as used
+    def session(self, request):
+        session = self.sessions.pop(str(request.get('session')), None)
+        if session is None:
+            raise ValueError("No such session (it may have been closed or thrown away for being idle).")
+        # Putting it back moves it to the end, so the sessions stay in the order they were last used
+        self.sessions[session.id] = session
+        session.last_used = time.monotonic()
+        return session
+
+    # Throws away idle sessions a few times per idle_timeout. The sessions are in the order they were last used, so the
+    # idle ones are all at the front and this stops at the first one that's still in use.
+    async def evict_idle_sessions(self):
+        while True:
+            await asyncio.sleep(max(self.idle_timeout / 4, 0.01))
+            cutoff = time.monotonic() - self.idle_timeout
+            idle = list(itertools.takewhile(lambda session: session.last_used < cutoff, self.sessions.values()))
+            for session in idle:
+                del self.sessions[session.id]
+            self.evicted += len(idle)
+
+
+def encode(reply):
+    return (json.dumps(reply, separators=(',', ':')) + "\n").encode()
+
+
+def spot(request):
+    return integer(request, 'row'), integer(request, 'col')
+
+
+# Reads a whole number out of a request. Floats (like 1e400), strings and true/false aren't accepted, since int() would
+# either blow up on them or quietly turn them into some other number.
+def integer(request, name):
+    value = request[name]
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f"'{name}' has to be a whole number.")
+    return value
+
+
+def cell_value(board, row, col):
+    cell = board.cells[board.index(row, col)]
+    return 'B' if cell & BOMB else cell & COUNT_MASK
+
+
+def bomb_spots(board):
+    dim = board.dim_size
+    return [list(divmod(i, dim)) for i, cell in enumerate(board.cells) if cell & BOMB]
+
+
+async def serve(host, port, unix_path, max_sessions, idle_timeout, max_dim):
+    game_server = GameServer(max_sessions, idle_timeout, max_dim)
+    server = await game_server.start(host, port, unix_path)
+    where = unix_path if unix_path is not None else f"{host}:{port}"
+    print(f"Serving Minesweeper on {where}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+# --- Load generator
+# Each simulated client opens its own connection and plays `games` games one after the other, digging random spots it
+# hasn't seen dug yet (kept up to date from the "changed" lists, like a real client would). Every request's round trip
+# is timed, so the results show the server's throughput and its tail latency.
+async def load_client(connect, games, dim, bombs, rng, latencies):
+    reader, writer = await connect()
+
+    async def request(message):
+        writer.write(encode(message))
+        start = time.perf_counter()
+        reply = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start)
+        if not reply['ok']:
+            raise RuntimeError(reply['error'])
+        return reply
+
+    try:
+        for _ in range(games):
+            reply = await request({'op': 'new', 'dim': dim, 'bombs': bombs, 'seed': rng.randrange(2 ** 63)})
+            session = reply['session']
+            undug = set(range(dim * dim))
+            while True:
+                i = rng.choice(tuple(undug)) if len(undug) < 64 else rng.randrange(dim * dim)
+                if i not in undug:
+                    continue
+                reply = await request({'op': 'dig', 'session': session, 'row': i // dim, 'col': i % dim})
+                undug.difference_update(r * dim + c for r, c, _ in reply['changed'])
+                if reply['status']['state'] != 'playing':
+                    break
+            await request({'op': 'close', 'session': session})
+    finally:
+        writer.close()
+
+
+async def run_load(connect, clients, games, dim, bombs, seed):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(load_client(connect, games, dim, bombs, random.Random(seed + n), latencies)
+                           for n in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return {'clients': clients, 'games': clients * games, 'requests': len(latencies), 'seconds': elapsed,
+            'requests_per_second': len(latencies) / elapsed, 'mean_ms': statistics.fmean(latencies) * 1000,
+            'p50_ms': percentile(0.50), 'p95_ms': percentile(0.95), 'p99_ms': percentile(0.99),
+            'max_ms': latencies[-1] * 1000}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host many Minesweeper games over a JSON-lines socket protocol.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('serve', "run the server"), ('load', "run the load generator against a server")):
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.add_argument('--host', default='127.0.0.1')
+        subparser.add_argument('--port', type=int, default=8765)
+        subparser.add_argument('--unix', default=None, help="use a Unix socket at this path instead of TCP")
+        if name == 'serve':
+            subparser.add_argument('--max-sessions', type=int, default=DEFAULT_MAX_SESSIONS)
+            subparser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                                   help="seconds before an unused session is thrown away")
+            subparser.add_argument('--max-dim', type=int, default=DEFAULT_MAX_DIM)
+        else:
+            subparser.add_argument('--clients', type=int, default=100, help="number of connections at once")
+            subparser.add_argument('--games', type=int, default=10, help="games played by each client")
+            subparser.add_argument('--dim', type=int, default=9)
+            subparser.add_argument('--bombs', type=int, default=10)
+            subparser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        try:
+            asyncio.run(serve(args.host, args.port, args.unix, args.max_sessions, args.idle_timeout, args.max_dim))
+        except KeyboardInterrupt:
+            pass
+    else:
+        if args.unix is not None:
+            def connect():
+                return asyncio.open_unix_connection(args.unix, limit=MAX_LINE * 64)
+        else:
+            def connect():
+                return asyncio.open_connection(args.host, args.port, limit=MAX_LINE * 64)
+        summary = asyncio.run(run_load(connect, args.clients, args.games, args.dim, args.bombs, args.seed))
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+import random
+
+from main import BOMB, COUNT_MASK
+
+# A solver that works out which spots are safe and which are bombs using only what the player can see (the numbers on
+# dug spots), the same way a person would:
+#   - if a number already touches that many known bombs, all of its other undug neighbours are safe
+#   - if a number has exactly as many undug neighbours as bombs left to find, they're all bombs
+#   - for two nearby numbers A and B, if B needs exactly as many more bombs than A as it has undug neighbours that A
+#     doesn't touch, then those neighbours are all bombs and A's neighbours that B doesn't touch are all safe
+#
+# Spots are referred to by their index into Board.cells. The solver keeps a "frontier" of dug numbers that still have
+# unknown neighbours, and only re-checks numbers whose neighbourhood has changed since they were last looked at, so it
+# never has to rescan the whole board after a move.
+
+
+class Solver:
+    def __init__(self, board, guesser=None, seed=None):
+        self.board = board
+        # guesser is called as guesser(solver) when nothing can be worked out for sure and should return the index of
+        # the spot to dig. By default the solver digs a random unknown spot.
+        self.guesser = guesser or random_guess
+        self.rng = random.Random(seed)
+        self.reset()
+
+    # Throw away everything the solver has worked out and rebuild it from the board as it is right now
+    def reset(self):
+        self.mines = set()  # spots worked out to be bombs
+        self.safe = set()  # spots worked out to be safe that haven't been dug yet
+        self.frontier = set()  # dug numbers that still have unknown neighbours
+        self.to_check = set()  # frontier spots whose neighbourhood changed since they were last checked
+        self.flag_mines = False
+        if self.board.cells is not None:
+            self.add_dug(list(self.board.dug))
+        # The board's dug_changes as of the last change the solver knows about
+        self.dug_changes_seen = self.board.dug_changes
+
+    # Tell the solver about spots that were just dug by one dig, e.g. the set returned by Board.dig_region()
+    def update(self, newly_dug):
+        if newly_dug:
+            dim = self.board.dim_size
+            self.add_dug([r * dim + c for r, c in newly_dug])
+            self.dug_changes_seen += 1
+
+    # Make sure the solver has seen every change to the dug spots. newly_dug can be the spots dug by the last dig, if
+    # that's the only change since the solver last looked. Otherwise (e.g. the player dug without telling the solver,
+    # or undid a move) this falls back to rebuilding everything from the board.
+    def sync(self, newly_dug=None):
+        if newly_dug is not None and self.dug_changes_seen == self.board.dug_changes - 1:
+            self.update(newly_dug)
+        if self.dug_changes_seen != self.board.dug_changes:
+            self.reset()
+
+    def add_dug(self, spots):
+        cells = self.board.cells
+        for i in spots:
+            self.safe.discard(i)
+            if cells[i] & BOMB:  # A dug bomb is as good as a known bomb
+                self.mines.add(i)
+            elif cells[i] & COUNT_MASK:
+                self.frontier.add(i)
+                self.to_check.add(i)
+            self.neighbours_changed(i)
+
+    # The spots around spot i, straight from the board's neighbours (so the solver works on any topology)
+    def neighbours(self, i):
+        return self.board.neighbours[i]
+
+    # Something about spot i changed, so any frontier number next to it needs checking again
+    def neighbours_changed(self, i):
+        frontier = self.frontier
+        for j in self.neighbours(i):
+            if j in frontier:
+                self.to_check.add(j)
+
+    # Returns the unknown neighbours of a dug number and how many bombs are still hidden among them
+    def constraint(self, i):
+        cells, dug, mines, safe = self.board.cells, self.board.dug.bits, self.mines, self.safe
+        bombs_left = cells[i] & COUNT_MASK
+        unknown = []
+        for j in self.neighbours(i):
+            if dug[j >> 3] >> (j & 7) & 1 or j in safe:
+                continue
+            if j in mines:
+                bombs_left -= 1
+            else:
+                unknown.append(j)
+        return unknown, bombs_left
+
+    def mark_safe(self, spots):
+        for i in spots:
+            if i not in self.safe:
+                self.safe.add(i)
+                self.neighbours_changed(i)
+
+    def mark_mines(self, spots):
+        for i in spots:
+            if i not in self.mines:
+                self.mines.add(i)
+                if self.flag_mines:
+                    self.board.flag_spot(*divmod(i, self.board.dim_size))
+                self.neighbours_changed(i)
+
+    # Work through every frontier number that needs checking, applying the single-number rules first and then the
+    # pairwise rule against the frontier numbers that share an unknown neighbour with it. Anything worked out gets
+    # added to self.safe / self.mines, which in turn queues up the numbers around it.
+    def deduce(self):
+        frontier, to_check = self.frontier, self.to_check
+        while to_check:
+            i = to_check.pop()
+            if i not in frontier:
+                continue
+            unknown, bombs_left = self.constraint(i)
+            if not unknown:
+                frontier.discard(i)
+                continue
+            if bombs_left == 0:
+                self.mark_safe(unknown)
+                continue
+            if bombs_left == len(unknown):
+                self.mark_mines(unknown)
+                continue
+
+            unknown_a = set(unknown)
+            nearby = {j for u in unknown for j in self.neighbours(u) if j in frontier and j != i}
+            for j in nearby:
+                unknown_b, bombs_left_b = self.constraint(j)
+                unknown_b = set(unknown_b)
+                only_a, only_b = unknown_a - unknown_b, unknown_b - unknown_a
+                if bombs_left_b - bombs_left == len(only_b) and (only_a or only_b):
+                    self.mark_mines(only_b)
+                    self.mark_safe(only_a)
+                    break
+                if bombs_left - bombs_left_b == len(only_a) and (only_a or only_b):
+                    self.mark_mines(only_a)
+                    self.mark_safe(only_b)
+                    break
+
+    # Returns the next move the solver is sure about as ('dig', row, col) or ('flag', row, col), or None if it would
+    # have to guess. Bombs are only suggested for flagging if they haven't been flagged on the board yet.
+    def hint(self):
+        self.sync()
+        self.deduce()
+        dim = self.board.dim_size
+        for i in self.safe:
+            return ('dig',) + divmod(i, dim)
+        for i in self.mines:
+            if i not in self.board.dug and i not in self.board.flags:
+                return ('flag',) + divmod(i, dim)
+        return None
+
+    def is_won(self):
+        return self.board.game_won()
+
+    # Plays the board until it's won or a guess hits a bomb. Returns True if the board was won. If nothing has been
+    # dug yet, the first dig is at `start` (default: the middle of the board). If flag_mines is True, every bomb the
+    # solver works out is flagged on the board too.
+    def solve(self, start=None, flag_mines=False):
+        board = self.board
+        dim = board.dim_size
+        self.sync()
+        self.flag_mines = flag_mines
+        if flag_mines:
+            for i in self.mines:
+                board.flag_spot(*divmod(i, dim))
+
+        if board.num_dug == 0:
+            row, col = start if start is not None else (dim // 2, dim // 2)
+            if not self.dig(row * dim + col):
+                return False
+
+        while not self.is_won():
+            self.deduce()
+            if self.safe:
+                while self.safe:
+                    self.dig(self.safe.pop())
+                continue
+            if not self.dig(self.guesser(self)):
+                return False
+        return True
+
+    # Digs spot i and tells the solver what got dug. Returns False if it was a bomb.
+    def dig(self, i):
+        row, col = divmod(i, self.board.dim_size)
+        self.update(self.board.dig_region(row, col))
+        return not self.board.cells[i] & BOMB
+
+    # Every spot that hasn't been dug and isn't known to be a bomb
+    def unknown_spots(self):
+        mines, size = self.mines, len(self.board.cells)
+        return [i for i, dug in enumerate(self.board.dug.spread(0, size, 1)) if not dug and i not in mines]
+
+    # The unknown spots that don't touch any dug number (and aren't known to be safe), which all have the same chance of
+    # being a bomb
+    def interior_spots(self):
+        next_to_numbers = {j for i in self.frontier for j in self.neighbours(i)}
+        return [i for i in self.unknown_spots() if i not in next_to_numbers and i not in self.safe]
+
+
+# The default guesser: dig a random unknown spot
+def random_guess(solver):
+    return solver.rng.choice(solver.unknown_spots())
+
+
+# Move policy for engine.simulate(): dig whatever the solver is sure is safe, and guess when it isn't sure of anything.
+# The solver is kept on the game between moves and fed the spots dug by the last move.
+def solver_policy(game, rng):
+    board = game.board
+    if board.cells is None:
+        return 'dig', board.dim_size // 2, board.dim_size // 2
+
+    solver = getattr(game, 'solver', None)
+    if solver is None:
+        solver = game.solver = Solver(board, seed=rng.random())
+    solver.sync(game.last_dug)
+    solver.deduce()
+    if solver.safe:
+        return ('dig',) + divmod(solver.safe.pop(), board.dim_size)
+    return ('dig',) + divmod(solver.guesser(solver), board.dim_size)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The game's modules sit at the top of the repo and import each other by name (from main import ...), so make them
+# importable from here
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,136 @@
+import random
+
+import pytest
+
+from chunked import ChunkedBoard
+from engine import Game
+from main import BOMB, Board
+
+# ChunkedBoard is checked against a plain Board with exactly the same bombs: every count (including the ones along
+# tile borders, which need the neighbouring tiles' bombs) and every dig should come out the same, however many tiles
+# have been evicted & rebuilt along the way.
+
+
+def chunked_board(dim=50, tile_size=8, max_tiles=1024, max_reveal=10 ** 9, seed=1, safe_spot=(7, 7), density=0.15):
+    board = ChunkedBoard(dim, density, tile_size=tile_size, max_tiles=max_tiles, max_reveal=max_reveal)
+    board.make_new_board(seed, safe_spot)
+    return board
+
+
+# A plain Board with the same bombs as a chunked one
+def plain_copy(chunked):
+    dim = chunked.dim_size
+    board = Board()
+    board.dim_size = dim
+    board.num_bombs = 1
+    board.make_new_board(0)
+    board.cells = bytearray(BOMB if chunked.is_bomb(r, c) else 0 for r in range(dim) for c in range(dim))
+    board.num_bombs = sum(1 for cell in board.cells if cell & BOMB)
+    board.safe_spots_left = dim ** 2 - board.num_bombs
+    board.assign_values_to_board()
+    return board
+
+
+def spots(dim):
+    return [(r, c) for r in range(dim) for c in range(dim)]
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('tile_size', [8, 16])
+@pytest.mark.parametrize('safe_spot', [(7, 7), (8, 8), (0, 49), None])
+def test_counts_match_a_plain_board(seed, tile_size, safe_spot):
+    board = chunked_board(tile_size=tile_size, seed=seed, safe_spot=safe_spot)
+    plain = plain_copy(board)
+    for r, c in spots(50):
+        assert board.surrounding_bombs(r, c) == plain.surrounding_bombs(r, c), (r, c)
+    assert board.num_bombs == plain.num_bombs
+    assert board.safe_spots_left == plain.safe_spots_left
+    if safe_spot is not None:
+        assert not any(board.is_bomb(r, c) for r, c in plain.surrounding_spots(*safe_spot) + [safe_spot])
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_digs_and_flags_survive_eviction(seed):
+    board = chunked_board(max_tiles=2, seed=seed, density=0.08)
+    plain = plain_copy(board)
+    rng = random.Random(seed)
+    evicted = False
+    for _ in range(60):
+        row, col = rng.randrange(50), rng.randrange(50)
+        if rng.random() < 0.3:
+            board.flag_spot(row, col)
+            plain.flag_spot(row, col)
+        elif not plain.is_bomb(row, col):
+            assert board.dig_region(row, col) == plain.dig_region(row, col)
+        assert len(board.tiles) <= 2
+        evicted = evicted or bool(board.cold_tiles)
+        assert (board.num_dug, board.num_flags, board.safe_spots_left) == \
+               (plain.num_dug, plain.num_flags, plain.safe_spots_left)
+
+    assert evicted
+    for r, c in spots(50):
+        assert (board.is_dug(r, c), board.is_flagged(r, c)) == (plain.is_dug(r, c), plain.is_flagged(r, c)), (r, c)
+
+
+def test_digging_everything_wins_and_a_bomb_loses():
+    board = chunked_board(max_tiles=3)
+    plain = plain_copy(board)
+    for r, c in spots(50):
+        if not plain.is_bomb(r, c):
+            board.dig_region(r, c)
+    assert board.game_won() and not board.game_lost()
+
+    bomb = next(spot for spot in spots(50) if plain.is_bomb(*spot))
+    board.dig_region(*bomb)
+    assert board.game_lost() and not board.game_won()
+
+
+def test_unfinished_digs_carry_on():
+    full = chunked_board(dim=300, tile_size=16, density=0.03, safe_spot=(150, 150))
+    expected = full.dig_region(150, 150) | full.dig_region(5, 290)
+
+    board = chunked_board(dim=300, tile_size=16, max_tiles=8, max_reveal=500, density=0.03, safe_spot=(150, 150))
+    dug = board.dig_region(150, 150) | board.dig_region(5, 290)
+    assert len(board.unfinished_digs) == 2
+    # Digging somewhere else in between doesn't lose either of them
+    while board.unfinished_digs:
+        dug |= board.dig_region(150, 150)
+    assert dug == expected
+    assert board.num_dug == full.num_dug
+
+
+def test_reveal_shows_every_spot():
+    board = chunked_board()
+    board.dig_region(7, 7)
+    undug = board.symbols['undug spot'] + "|"
+    assert undug in board.render_viewport(0, 0, 50, 50)
+    board.reveal_board()
+    assert undug not in board.render_viewport(0, 0, 50, 50)
+
+
+def test_clear_dug_keeps_the_flags():
+    board = chunked_board(max_tiles=1)
+    board.dig_region(7, 7)
+    board.flag_spot(40, 40)
+    board.dig_region(*next(spot for spot in spots(50) if not board.is_bomb(*spot) and not board.is_dug(*spot)))
+    board.clear_dug()
+    assert board.num_dug == 0 and not board.is_dug(7, 7) and board.is_flagged(40, 40)
+    assert board.safe_spots_left == plain_copy(board).safe_spots_left
+
+
+@pytest.mark.parametrize('method, args', [('index', (1, 1)), ('add_bomb', (1, 1)), ('move_bomb', (1, 1, 2, 2)),
+                                          ('snapshot', ()), ('undo', ()), ('assign_values_to_board', ())])
+def test_unsupported_board_methods_raise(method, args):
+    with pytest.raises(NotImplementedError):
+        getattr(chunked_board(), method)(*args)
+
+
+def test_game_on_a_huge_board():
+    game = Game(100_000, 1_500_000_000, seed=1, chunked=True)
+    game.flag(0, 0)
+    dug = game.dig(50_000, 50_000)
+    assert dug and game.state == 'playing'
+    assert game.board.is_flagged(0, 0)
+    assert len(game.board.tiles) <= game.board.max_tiles
+    assert game.board.safe_spots_left == 10 ** 10 - game.board.num_bombs - len(dug)
+    assert "Rows" in str(game.board)
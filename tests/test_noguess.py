@@ -0,0 +1,66 @@
+import pytest
+
+from main import BOMB, Board
+from noguess import no_guess_bomb_spots
+from probability import ProbabilityEngine
+from solver import Solver
+
+# A no-guess board has to be solvable from its safe spot without ever guessing, and has to come out the same however
+# many processes searched for it (saved games and move logs rebuild it from the seed).
+
+SETTINGS = [(9, 10, 'square', 1), (9, 16, 'square', 2), (12, 30, 'square', 3), (9, 12, 'torus', 4), (9, 12, 'hex', 5)]
+# With a first dig at (0, 0), these are dense enough that the first few candidates can't be repaired: with seed 0,
+# candidates 2 & 3 both work and are checked in the same round when there are 2 workers, and with seed 2 it's 3 & 4
+# that work, which are in different rounds
+WORKER_SETTINGS = [(9, 30, 'square', 0), (9, 30, 'square', 2), (9, 25, 'square', 2)]
+
+
+def no_guess_board(dim_size, num_bombs, topology, seed, safe_spot, workers):
+    board = Board()
+    board.dim_size = dim_size
+    board.num_bombs = num_bombs
+    board.topology = topology
+    board.no_guess = True
+    board.no_guess_workers = workers
+    board.make_new_board(seed, safe_spot)
+    return board
+
+
+# Plays the board from the safe spot, only ever digging spots that are certainly safe (from the solver's rules or a
+# 0% chance). Returns False if it has to guess.
+def solve_with_certain_moves(board, safe_spot):
+    solver = Solver(board)
+    engine = ProbabilityEngine(solver)
+    assert solver.dig(board.index(*safe_spot))
+    while not board.game_won():
+        solver.deduce()
+        if not solver.safe:
+            chances, interior_chance = engine.probabilities()
+            certain_safe = [i for i, chance in chances.items() if chance == 0.0]
+            if interior_chance == 0.0:
+                certain_safe.extend(solver.interior_spots())
+            if not certain_safe:
+                return False
+            solver.mark_safe(certain_safe)
+        while solver.safe:
+            assert solver.dig(solver.safe.pop())
+    return True
+
+
+@pytest.mark.parametrize('dim_size, num_bombs, topology, seed', SETTINGS)
+def test_no_guess_boards_can_be_solved_without_guessing(dim_size, num_bombs, topology, seed):
+    safe_spot = (dim_size // 2, dim_size // 3)
+    board = no_guess_board(dim_size, num_bombs, topology, seed, safe_spot, 1)
+    assert sum(1 for cell in board.cells if cell & BOMB) == num_bombs
+    assert solve_with_certain_moves(board, safe_spot)
+
+
+@pytest.mark.parametrize('dim_size, num_bombs, topology, seed', WORKER_SETTINGS + SETTINGS[:1])
+def test_the_board_doesnt_depend_on_the_number_of_workers(dim_size, num_bombs, topology, seed):
+    safe_spot = (0, 0)
+    one = no_guess_bomb_spots(dim_size, num_bombs, topology, seed, safe_spot, workers=1)
+    two = no_guess_bomb_spots(dim_size, num_bombs, topology, seed, safe_spot, workers=2)
+    assert one == two and len(one) == num_bombs
+    assert solve_with_certain_moves(no_guess_board(dim_size, num_bombs, topology, seed, safe_spot, 1), safe_spot)
+    assert no_guess_board(dim_size, num_bombs, topology, seed, safe_spot, 2).cells == \
+           no_guess_board(dim_size, num_bombs, topology, seed, safe_spot, 1).cells
@@ -0,0 +1,85 @@
+import io
+import re
+
+from main import run_script
+from movelog import read_games, replay
+
+# These play the game through run_script(), the same way 'python main.py --script' does, and check what the script
+# asked for with 'status' and 'board'. The seed makes the boards the same every time: with seed 1, a 9x9 board with 10
+# bombs opens up 56 spots when (4, 4) is dug.
+
+SETUP = ['9', '10']
+
+
+def play_script(capsys, lines, **kwargs):
+    run_script(io.StringIO("\n".join(SETUP + lines) + "\n"), seed=1, **kwargs)
+    return capsys.readouterr().out
+
+
+def statuses(out):
+    return re.findall(r"^(\w+): (\d+) dug, (\d+) flagged, (\d+) safe spots left \((\d+) won, (\d+) lost so far\)$",
+                      out, re.MULTILINE)
+
+
+def test_quiet_script_only_prints_what_it_asks_for(capsys):
+    out = play_script(capsys, ['status', 'quit'])
+    assert out == "playing: 0 dug, 0 flagged, 71 safe spots left (0 won, 0 lost so far)\n"
+
+
+def test_dig_and_flag(capsys):
+    out = play_script(capsys, ['4, 4', 'd', 'status', 'f 0, 0', 'status', 'quit'])
+    assert statuses(out) == [('playing', '56', '0', '15', '0', '0'), ('playing', '56', '1', '15', '0', '0')]
+
+
+def test_hints_and_bad_input_are_printed_when_quiet(capsys):
+    out = play_script(capsys, ['hint', 'not a spot', '4, 4', 'd', 'hint', 'quit'])
+    assert "Nothing's been dug yet" in out
+    assert "Please enter 2 integers between 0 and 8" in out
+    assert re.search(r"Try (digging|flagging) spot \(\d, \d\)\.", out)
+
+
+def test_auto_finishes_the_game(capsys):
+    out = play_script(capsys, ['4, 4', 'd', 'auto', 'status', 'quit'])
+    (state, dug, flagged, safe_left, won, lost), = statuses(out)
+    # auto finishes the game, so the status is for the next one
+    assert (state, dug, flagged, safe_left) == ('playing', '0', '0', '71')
+    assert int(won) + int(lost) == 1
+
+
+def test_undo_and_redo(capsys):
+    out = play_script(capsys, ['4, 4', 'd', 'f 0, 0', 'undo', 'status', 'undo', 'status', 'undo', 'redo', 'redo',
+                               'status', 'quit'])
+    assert statuses(out) == [('playing', '56', '0', '15', '0', '0'), ('playing', '0', '0', '71', '0', '0'),
+                             ('playing', '56', '1', '15', '0', '0')]
+    assert "There's nothing to undo." in out
+
+
+def test_save_and_load(capsys, tmp_path):
+    path = str(tmp_path / 'game.save')
+    out = play_script(capsys, ['4, 4', 'd', 'save', path, 'f 0, 0', 'undo', 'undo', 'redo', 'redo', 'status', 'board',
+                               'quit'])
+    assert "Saved!" in out
+    # Saving mid-game keeps the moves from before it undoable
+    assert statuses(out) == [('playing', '56', '1', '15', '0', '0')]
+    board = out[out.index("\n", out.index("safe spots left")) + 1:]
+
+    # The saved game carries on from where it was, including the flag placed after saving, but its moves can't be
+    # undone since they were made before it was loaded
+    run_script(io.StringIO("status\nboard\nundo\nquit\n"), save_path=path)
+    out = capsys.readouterr().out
+    assert out == ("playing: 56 dug, 1 flagged, 15 safe spots left (0 won, 0 lost so far)\n" + board
+                   + "There's nothing to undo.\n")
+
+
+def test_move_log_round_trip(capsys, tmp_path):
+    path = str(tmp_path / 'moves.log')
+    out = play_script(capsys, ['4, 4', 'd', 'f 0, 0', 'status', 'undo', 'quit'], log_path=path)
+    assert statuses(out) == [('playing', '56', '1', '15', '0', '0')]
+    assert "can't be undone while they're being logged" in out
+
+    (settings, moves), = read_games(path)
+    assert (settings['dim_size'], settings['num_bombs'], settings['seed']) == (9, 10, 1)
+    board, result = replay(settings, moves)
+    assert (board.num_dug, board.num_flags, board.safe_spots_left) == (56, 1, 15)
+    assert board.is_flagged(0, 0) and board.is_dug(4, 4)
+    assert result['state'] == 'playing' and result['reveal_sizes'] == [56]
@@ -0,0 +1,68 @@
+import random
+from fractions import Fraction
+from itertools import combinations
+
+import pytest
+
+from main import BOMB, COUNT_MASK, Board
+from probability import ProbabilityEngine
+from solver import Solver
+
+# ProbabilityEngine counts layouts component by component instead of trying every one, so these check it against
+# actually trying every one: on a 5x5 board there are few enough undug spots to go through every way of putting the
+# bombs among them, keep the ways that match the dug numbers, and count how often each spot has a bomb.
+
+
+# A seeded 5x5 board with a few spots dug
+def dug_board(seed, num_bombs, digs):
+    board = Board()
+    board.dim_size = 5
+    board.num_bombs = num_bombs
+    board.make_new_board(seed, (2, 2) if seed % 2 else None)
+    rng = random.Random(seed)
+    safe = [i for i in range(25) if not board.cells[i] & BOMB]
+    for i in rng.sample(safe, digs):
+        board.dig_region(*divmod(i, 5))
+    return board
+
+
+# Returns {spot index: chance it's a bomb} for every undug spot, from every layout that matches what's been dug
+def brute_force(board):
+    # Each dug number as (bitmask of its neighbours, how many bombs it says are there)
+    numbers = [(sum(1 << j for j in board.neighbours[i]), board.cells[i] & COUNT_MASK)
+               for i in board.dug if not board.cells[i] & BOMB]
+    undug = [i for i in range(25) if i not in board.dug]
+    bomb_counts = dict.fromkeys(undug, 0)
+    layouts = 0
+    for bombs in combinations(undug, board.num_bombs):
+        mask = sum(1 << i for i in bombs)
+        if all(bin(mask & around).count("1") == count for around, count in numbers):
+            layouts += 1
+            for i in bombs:
+                bomb_counts[i] += 1
+    return {i: Fraction(count, layouts) for i, count in bomb_counts.items()}
+
+
+@pytest.mark.parametrize('seed', range(8))
+@pytest.mark.parametrize('num_bombs, digs', [(4, 1), (6, 2), (8, 3)])
+def test_probabilities_match_brute_force(seed, num_bombs, digs):
+    board = dug_board(seed, num_bombs, digs)
+    if board.game_won():
+        pytest.skip("Nothing left to work out")
+    solver = Solver(board)
+    chances, interior_chance = ProbabilityEngine(solver).probabilities()
+    expected = brute_force(board)
+
+    for i, chance in chances.items():
+        assert chance == pytest.approx(float(expected[i])), divmod(i, 5)
+    # Whatever the solver worked out for sure has to be certain in every layout too
+    assert all(expected[i] == 1 for i in solver.mines)
+
+    interior = solver.interior_spots()
+    if interior:
+        assert interior_chance == pytest.approx(float(expected[interior[0]]))
+        assert len({expected[i] for i in interior}) == 1
+    else:
+        assert interior_chance is None
+    # Every undug spot is covered by one of the three
+    assert set(chances) | set(solver.mines) | set(interior) == set(expected)
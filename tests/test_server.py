@@ -0,0 +1,133 @@
+import asyncio
+import json
+
+from server import MAX_LINE, GameServer
+
+# These run a real GameServer on a local port and talk to it over a socket, one JSON line at a time.
+
+
+# Starts a server, connects a client to it, and runs test(client, game_server) with them
+def run_with_server(test, **options):
+    async def main():
+        game_server = GameServer(**options)
+        server = await game_server.start('127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port, limit=MAX_LINE * 64)
+        try:
+            await test(Client(reader, writer), game_server)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+            game_server.reaper.cancel()
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(main())
+
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def send_line(self, line):
+        self.writer.write(line + b"\n")
+        reply = await self.reader.readline()
+        return json.loads(reply) if reply else None
+
+    async def send(self, **request):
+        return await self.send_line(json.dumps(request).encode())
+
+
+def test_a_whole_game():
+    async def test(client, game_server):
+        reply = await client.send(op='new', dim=9, bombs=10, seed=1, id=7)
+        assert reply['ok'] and reply['id'] == 7
+        session = reply['session']
+        assert reply['status']['state'] == 'playing' and reply['status']['safe_spots_left'] == 71
+
+        # A flag before the first dig is kept until the board is built
+        reply = await client.send(op='flag', session=session, row=0, col=0)
+        assert reply['changed'] == [[0, 0, 'F']] and reply['status']['flags'] == 1
+
+        # With seed 1, (4, 4) opens up 54 spots
+        reply = await client.send(op='dig', session=session, row=4, col=4)
+        assert reply['ok'] and len(reply['changed']) == reply['status']['dug'] == 54
+        assert all(value != 'B' for _, _, value in reply['changed'])
+        dug = {(r, c): value for r, c, value in reply['changed']}
+
+        # A dug spot can't be flagged, and doesn't count as a flag
+        reply = await client.send(op='flag', session=session, row=4, col=4)
+        assert not reply['ok'] and 'already been dug' in reply['error']
+
+        reply = await client.send(op='state', session=session)
+        assert reply['status']['flags'] == 1 and reply['status']['moves'] == 2
+        assert [0, 0, 'F'] in reply['changed']
+        assert {(r, c): value for r, c, value in reply['changed'] if value != 'F'} == dug
+
+        assert (await client.send(op='stats'))['sessions'] == 1
+        assert (await client.send(op='close', session=session))['ok']
+        reply = await client.send(op='state', session=session)
+        assert not reply['ok'] and 'No such session' in reply['error']
+        assert (await client.send(op='stats'))['sessions'] == 0
+
+    run_with_server(test)
+
+
+def test_losing_shows_the_bombs():
+    async def test(client, game_server):
+        session = (await client.send(op='new', dim=9, bombs=10, seed=1))['session']
+        await client.send(op='dig', session=session, row=4, col=4)
+        board = game_server.sessions[session].game.board
+        bomb = next(divmod(i, 9) for i in range(81) if board.is_bomb(*divmod(i, 9)))
+        reply = await client.send(op='dig', session=session, row=bomb[0], col=bomb[1])
+        assert reply['status']['state'] == 'lost'
+        assert [bomb[0], bomb[1], 'B'] in reply['changed'] and len(reply['bombs']) == 10
+        reply = await client.send(op='dig', session=session, row=0, col=0)
+        assert not reply['ok'] and 'game is over' in reply['error']
+
+    run_with_server(test)
+
+
+def test_error_replies():
+    async def test(client, game_server):
+        assert (await client.send_line(b"{not json"))['error'] == "That isn't valid JSON."
+        assert (await client.send_line(b"[1, 2]"))['error'] == "Requests have to be JSON objects."
+        assert 'Unknown op' in (await client.send(op='explode', id='x'))['error']
+        assert (await client.send(op='new', bombs=10))['error'] == "'new' needs 'dim'."
+
+        # Numbers have to be JSON integers
+        for bad in ({'dim': 1e400}, {'dim': 9.0}, {'dim': True}, {'dim': "9"}, {'seed': [1]}):
+            request = dict({'op': 'new', 'dim': 9, 'bombs': 10}, **bad)
+            reply = await client.send_line(json.dumps(request).replace('Infinity', '1e400').encode())
+            assert not reply['ok'] and 'whole number' in reply['error'], bad
+        assert (await client.send(op='new', dim=10 ** 6, bombs=10))['error'].startswith("Boards can't be bigger")
+
+        session = (await client.send(op='new', dim=9, bombs=10, seed=1))['session']
+        for bad in ({'row': 1.5}, {'row': None}, {'col': "2"}, {'row': 10 ** 30}):
+            reply = await client.send(**dict({'op': 'dig', 'session': session, 'row': 1, 'col': 2}, **bad))
+            assert not reply['ok'], bad
+        assert 'No such session' in (await client.send(op='dig', session='nope', row=1, col=2))['error']
+        # None of that stopped the session from working
+        assert (await client.send(op='dig', session=session, row=4, col=4))['ok']
+
+        # A line that's too long gets an error, and then the connection is closed
+        reply = await client.send_line(b"x" * (MAX_LINE + 10))
+        assert not reply['ok'] and 'longer than' in reply['error']
+        assert await client.reader.readline() == b""
+
+    run_with_server(test)
+
+
+def test_idle_sessions_are_evicted():
+    async def test(client, game_server):
+        idle = (await client.send(op='new', dim=9, bombs=10))['session']
+        busy = (await client.send(op='new', dim=9, bombs=10))['session']
+        for _ in range(6):
+            await asyncio.sleep(0.05)
+            assert (await client.send(op='state', session=busy))['ok']
+        assert 'No such session' in (await client.send(op='state', session=idle))['error']
+        stats = await client.send(op='stats')
+        assert stats['sessions'] == 1 and stats['evicted'] == 1
+
+    run_with_server(test, idle_timeout=0.2)